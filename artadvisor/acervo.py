@@ -0,0 +1,245 @@
+# acervo.py — Espelho local do acervo do Art Institute of Chicago
+# Baixa os metadados das obras (dump público ou API paginada) para um JSONL
+# compactado e monta em memória um índice invertido sobre título, estilos,
+# termos e classificações. A busca local imita a do buscar_obras_contemporaneas
+# (termo + faixa de date_end + só obras com image_id), sem rede e sem variar
+# de uma execução para outra.
+#
+# Uso:
+#   python acervo.py baixar                       # API paginada (obras recentes)
+#   python acervo.py baixar --dump artic-api-data.tar.bz2
+#   python acervo.py buscar "contemporary abstract texture"
+#
+# Dump completo: https://artic-api-data.s3.amazonaws.com/artic-api-data.tar.bz2
+
+import argparse
+import gzip
+import heapq
+import json
+import math
+import os
+import re
+import tarfile
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Iterable, Iterator, Optional
+
+import requests
+
+# ──────────────────────────────────────────────
+# CONFIGURAÇÃO
+# ──────────────────────────────────────────────
+ACERVO_ARQUIVO = os.getenv("ACERVO_ARQUIVO", "./acervo/artworks.jsonl.gz")
+ARTIC_API_URL = "https://api.artic.edu/api/v1"
+# O ARTIC pede no máximo 60 requisições/min sem chave
+ACERVO_PAUSA = float(os.getenv("ACERVO_PAUSA", "1.0"))
+ACERVO_POR_PAGINA = 100
+
+# Campos que a curadoria usa (os mesmos pedidos na busca online)
+CAMPOS_ARTIC = [
+    "id", "title", "image_id", "artist_title", "date_end",
+    "style_titles", "classification_titles", "term_titles", "department_title",
+]
+# Campos indexados e o peso de cada um no score
+CAMPOS_INDEXADOS = {"title": 2.0, "style_titles": 1.5, "term_titles": 1.0, "classification_titles": 1.0}
+
+_PALAVRAS_VAZIAS = {"a", "an", "and", "the", "of", "in", "on", "with", "for", "to", "by"}
+
+
+def tokenizar(texto: str) -> list[str]:
+    """'Contemporary Abstract — Texture' → ['contemporary', 'abstract', 'texture']."""
+    sem_acento = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode()
+    return [t for t in re.split(r"[^a-z0-9]+", sem_acento.lower()) if t and t not in _PALAVRAS_VAZIAS]
+
+
+def _enxugar(item: dict) -> dict:
+    """Só os campos da curadoria (o dump traz dezenas de outros)."""
+    return {campo: item.get(campo) for campo in CAMPOS_ARTIC}
+
+
+# ──────────────────────────────────────────────
+# INGESTÃO
+# ──────────────────────────────────────────────
+def _gravar_jsonl(itens: Iterable[dict], caminho: str) -> int:
+    """Grava obras com image_id em JSONL gzip (arquivo temporário + rename)."""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    total = 0
+    with gzip.open(temporario, "wt", encoding="utf-8") as saida:
+        for item in itens:
+            if not item.get("image_id"):
+                continue
+            saida.write(json.dumps(_enxugar(item), ensure_ascii=False) + "\n")
+            total += 1
+    os.replace(temporario, caminho)
+    return total
+
+
+def ler_dump(caminho_dump: str) -> Iterator[dict]:
+    """Obras do dump público (tar.bz2 com um JSON por obra em json/artworks/)."""
+    with tarfile.open(caminho_dump, "r:*") as tar:
+        for membro in tar:
+            if not (membro.isfile() and "/artworks/" in membro.name and membro.name.endswith(".json")):
+                continue
+            arquivo = tar.extractfile(membro)
+            if arquivo is None:
+                continue
+            try:
+                yield json.load(arquivo)
+            except json.JSONDecodeError:
+                continue
+
+
+def ler_api(data_min: int = 1985, data_max: int = 2030, max_paginas: Optional[int] = None) -> Iterator[dict]:
+    """
+    Obras da faixa de datas da curadoria, página a página pela API de busca
+    (a API não pagina além de 10 mil resultados; para o acervo todo, use o dump).
+    """
+    sessao = requests.Session()
+    pagina = 1
+    while max_paginas is None or pagina <= max_paginas:
+        resp = sessao.post(
+            f"{ARTIC_API_URL}/artworks/search",
+            json={
+                "fields": CAMPOS_ARTIC,
+                "limit": ACERVO_POR_PAGINA,
+                "page": pagina,
+                "query": {
+                    "bool": {
+                        "must": [
+                            {"range": {"date_end": {"gte": data_min, "lte": data_max}}},
+                            {"exists": {"field": "image_id"}},
+                        ],
+                    }
+                },
+            },
+            timeout=30,
+        )
+        resp.raise_for_status()
+        dados = resp.json()
+        yield from dados.get("data", [])
+
+        paginacao = dados.get("pagination", {})
+        if pagina >= paginacao.get("total_pages", 0) or pagina * ACERVO_POR_PAGINA >= 10000:
+            return
+        pagina += 1
+        time.sleep(ACERVO_PAUSA)
+
+
+def ler_jsonl(caminho: str = ACERVO_ARQUIVO) -> Iterator[dict]:
+    with gzip.open(caminho, "rt", encoding="utf-8") as entrada:
+        for linha in entrada:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+# ──────────────────────────────────────────────
+# ÍNDICE INVERTIDO
+# ──────────────────────────────────────────────
+class IndiceAcervo:
+    """
+    Índice invertido em memória: token → [(obra, peso)], com o peso já em
+    TF-IDF (soma dos pesos dos campos onde o token aparece × idf).
+    Busca = OU entre os tokens do termo, ordenada por score e depois por id.
+    """
+
+    def __init__(self, obras: list[dict]):
+        self.obras = obras
+        self.datas = [obra.get("date_end") for obra in obras]
+        frequencias = defaultdict(dict)  # token → {posição da obra: tf ponderado}
+        for posicao, obra in enumerate(obras):
+            for campo, peso in CAMPOS_INDEXADOS.items():
+                valor = obra.get(campo) or []
+                textos = valor if isinstance(valor, list) else [valor]
+                for token in tokenizar(" ".join(t for t in textos if t)):
+                    frequencias[token][posicao] = frequencias[token].get(posicao, 0.0) + peso
+
+        total = max(len(obras), 1)
+        self.postings = {
+            token: [(posicao, tf * math.log(1 + total / len(docs))) for posicao, tf in docs.items()]
+            for token, docs in frequencias.items()
+        }
+
+    @classmethod
+    def carregar(cls, caminho: str = ACERVO_ARQUIVO) -> "IndiceAcervo":
+        return cls(list(ler_jsonl(caminho)))
+
+    def buscar(self, termo: str, limite: int = 20, data_min: int = 1985, data_max: int = 2030) -> list[dict]:
+        """Mesma forma do 'data' da API: lista de obras com CAMPOS_ARTIC."""
+        scores = defaultdict(float)
+        for token in set(tokenizar(termo)):
+            for posicao, peso in self.postings.get(token, ()):
+                scores[posicao] += peso
+
+        candidatas = [
+            (score, posicao) for posicao, score in scores.items()
+            if self.datas[posicao] is not None and data_min <= self.datas[posicao] <= data_max
+        ]
+        melhores = heapq.nsmallest(limite, candidatas, key=lambda c: (-c[0], self.obras[c[1]]["id"]))
+        return [self.obras[posicao] for _, posicao in melhores]
+
+
+_indice: Optional[IndiceAcervo] = None
+_indice_versao = None
+_lock_indice = threading.Lock()
+
+
+def indice_local(caminho: str = ACERVO_ARQUIVO) -> Optional[IndiceAcervo]:
+    """Índice do espelho local (recarrega se o arquivo mudou), ou None se não há espelho."""
+    global _indice, _indice_versao
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    versao = (info.st_ino, info.st_mtime_ns, info.st_size)
+    with _lock_indice:
+        if _indice is None or _indice_versao != versao:
+            inicio = time.perf_counter()
+            _indice = IndiceAcervo.carregar(caminho)
+            _indice_versao = versao
+            print(f"📚 Acervo local: {len(_indice.obras)} obras indexadas em "
+                  f"{time.perf_counter() - inicio:.1f}s")
+        return _indice
+
+
+# ──────────────────────────────────────────────
+# LINHA DE COMANDO
+# ──────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Espelho local do acervo do ARTIC")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    baixar = comandos.add_parser("baixar", help="ingere o acervo para o JSONL local")
+    baixar.add_argument("--dump", help="caminho do artic-api-data.tar.bz2 (senão usa a API)")
+    baixar.add_argument("--max-paginas", type=int, default=None)
+    baixar.add_argument("--saida", default=ACERVO_ARQUIVO)
+
+    buscar = comandos.add_parser("buscar", help="testa uma busca no índice local")
+    buscar.add_argument("termo")
+    buscar.add_argument("--limite", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.comando == "baixar":
+        inicio = time.perf_counter()
+        itens = ler_dump(args.dump) if args.dump else ler_api(max_paginas=args.max_paginas)
+        total = _gravar_jsonl(itens, args.saida)
+        print(f"✅ {total} obras com imagem gravadas em {args.saida} "
+              f"({time.perf_counter() - inicio:.0f}s)")
+        return
+
+    indice = indice_local()
+    if indice is None:
+        print(f"❌ Sem espelho local em {ACERVO_ARQUIVO}. Rode: python acervo.py baixar")
+        return
+    inicio = time.perf_counter()
+    obras = indice.buscar(args.termo, args.limite)
+    duracao = (time.perf_counter() - inicio) * 1000
+    for obra in obras:
+        print(f"  {obra['id']:>7}  {obra.get('date_end')}  {obra.get('title')} — {obra.get('artist_title')}")
+    print(f"🔍 {len(obras)} obras em {duracao:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
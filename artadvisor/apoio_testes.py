@@ -0,0 +1,31 @@
+# apoio_testes.py — Ambiente temporário dos testes
+# Importe ANTES de main/curador: aponta DATABASE_URL e IMAGE_CACHE_DIR para
+# uma pasta temporária. O main só é importado uma vez por processo, então a
+# pasta é compartilhada pelos módulos de teste; cada um chama reservar() ao
+# ser importado e liberar() no tearDownModule, e o último apaga a pasta.
+
+import os
+import shutil
+import tempfile
+
+PASTA = tempfile.mkdtemp(prefix="artadvisor-teste-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(PASTA, 'teste.db')}"
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(PASTA, "cache_imagens")
+
+_modulos = 0
+
+
+def reservar():
+    global _modulos
+    _modulos += 1
+
+
+def liberar():
+    """Apaga a pasta quando o último módulo de teste termina."""
+    global _modulos
+    _modulos -= 1
+    if _modulos > 0:
+        return
+    from main import engine
+    engine.dispose()
+    shutil.rmtree(PASTA, ignore_errors=True)
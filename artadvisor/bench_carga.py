@@ -0,0 +1,120 @@
+# bench_carga.py — Teste de carga: rotas síncronas × assíncronas (DB_ASYNC)
+# Sobe o servidor com um único worker uvicorn, primeiro com DB_ASYNC=0 e
+# depois com DB_ASYNC=1, dispara requisições concorrentes numa rota que
+# consulta o banco e compara vazão e latência.
+#
+# Uso: python bench_carga.py [--rota "/perfil?limite=50"] [--concorrencia 200]
+#                            [--duracao 10] [--tags 5000]
+# Sem DATABASE_URL, usa um SQLite temporário. Para números de produção,
+# aponte DATABASE_URL para um Postgres (a latência de rede é onde o modo
+# assíncrono mais ganha: a thread não fica parada esperando o banco).
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_dir = tempfile.mkdtemp(prefix="bench_carga_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_dir, 'bench.db')}")
+# Sem cache do /perfil: toda requisição vai ao banco
+os.environ["PERFIL_CACHE_TTL"] = "0"
+
+import httpx  # noqa: E402
+from main import SessionLocal, incrementar_tags  # noqa: E402
+
+PORTA = 8765
+
+
+def popular(tags: int):
+    db = SessionLocal()
+    try:
+        incrementar_tags(db, {f"tag-{i}": (1 + i % 13, float(i % 97)) for i in range(tags)})
+        db.commit()
+    finally:
+        db.close()
+
+
+def subir_servidor(modo_async: bool) -> subprocess.Popen:
+    env = {**os.environ, "DB_ASYNC": "1" if modo_async else "0"}
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORTA),
+         "--workers", "1", "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            httpx.get(f"http://127.0.0.1:{PORTA}/", timeout=1)
+            return servidor
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    servidor.terminate()
+    raise RuntimeError("Servidor não subiu")
+
+
+async def carga(rota: str, concorrencia: int, duracao: float):
+    """Cada um dos `concorrencia` clientes repete a requisição até o tempo acabar."""
+    latencias, erros = [], 0
+    fim = time.monotonic() + duracao
+    limites = httpx.Limits(max_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORTA}", limits=limites,
+                                 timeout=30) as cliente:
+        async def usuario():
+            nonlocal erros
+            while time.monotonic() < fim:
+                inicio = time.perf_counter()
+                try:
+                    resp = await cliente.get(rota)
+                    if resp.status_code != 200:
+                        erros += 1
+                        continue
+                except httpx.HTTPError:
+                    erros += 1
+                    continue
+                latencias.append((time.perf_counter() - inicio) * 1000)
+
+        await asyncio.gather(*[usuario() for _ in range(concorrencia)])
+    return latencias, erros
+
+
+def relatorio(nome: str, latencias: list[float], erros: int, duracao: float):
+    latencias.sort()
+    p99 = latencias[int(len(latencias) * 0.99) - 1] if latencias else 0
+    print(
+        f"{nome:<10} {len(latencias) / duracao:8.0f} req/s   "
+        f"p50={statistics.median(latencias) if latencias else 0:7.1f} ms   "
+        f"p99={p99:7.1f} ms   erros={erros}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga sync × async")
+    parser.add_argument("--rota", default="/perfil?limite=50")
+    parser.add_argument("--concorrencia", type=int, default=200)
+    parser.add_argument("--duracao", type=float, default=10)
+    parser.add_argument("--tags", type=int, default=5000)
+    args = parser.parse_args()
+
+    popular(args.tags)
+    print(f"🚦 {args.concorrencia} clientes em {args.rota} por {args.duracao:.0f}s, 1 worker")
+    for nome, modo_async in (("DB_ASYNC=0", False), ("DB_ASYNC=1", True)):
+        servidor = subir_servidor(modo_async)
+        try:
+            latencias, erros = asyncio.run(carga(args.rota, args.concorrencia, args.duracao))
+        finally:
+            servidor.terminate()
+            servidor.wait()
+        relatorio(nome, latencias, erros, args.duracao)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(_dir, ignore_errors=True)
@@ -0,0 +1,89 @@
+# bench_feed.py — Benchmark da consulta do feed
+# Enche um SQLite temporário com alguns anos de curadoria diária e mede a
+# consulta do /feed/hoje com e sem o índice (data_exibicao, id).
+#
+# Uso: python bench_feed.py [--anos 5] [--por-dia 10] [--repeticoes 200]
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Banco temporário ANTES de importar o main (ele cria as tabelas ao importar)
+_dir = tempfile.mkdtemp(prefix="bench_feed_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_dir, 'bench.db')}"
+
+from sqlalchemy import insert, text  # noqa: E402
+from main import Obra, SessionLocal, engine  # noqa: E402
+
+
+def popular(anos: int, por_dia: int):
+    """Insere `por_dia` obras para cada dia dos últimos `anos` anos."""
+    hoje = date.today()
+    linhas = [
+        {
+            "titulo": f"Obra {d}-{i}",
+            "imagem_url": f"img-{d}-{i}",
+            "tags_extraidas": "abstrato, textura, azul",
+            "data_exibicao": hoje - timedelta(days=d),
+            "curtiu": False,
+        }
+        for d in range(anos * 365)
+        for i in range(por_dia)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Obra), linhas)
+    return len(linhas)
+
+
+def medir(repeticoes: int) -> list[float]:
+    """Tempo (ms) de cada execução da consulta do feed."""
+    tempos = []
+    db = SessionLocal()
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            db.query(Obra).filter(Obra.data_exibicao == date.today()).order_by(Obra.id).all()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+            db.expunge_all()
+    finally:
+        db.close()
+    return tempos
+
+
+def relatorio(nome: str, tempos: list[float]):
+    tempos = sorted(tempos)
+    p95 = tempos[int(len(tempos) * 0.95) - 1]
+    print(f"{nome:<12} p50={statistics.median(tempos):7.3f} ms   p95={p95:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da consulta do feed")
+    parser.add_argument("--anos", type=int, default=5)
+    parser.add_argument("--por-dia", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    total = popular(args.anos, args.por_dia)
+    print(f"📦 {total} obras ({args.anos} anos × {args.por_dia}/dia)")
+
+    with engine.connect() as conn:
+        plano = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM obras WHERE data_exibicao = :d ORDER BY id"
+        ), {"d": date.today()}).fetchall()
+    print(f"🔍 Plano: {plano[-1][-1]}")
+    relatorio("com índice", medir(args.repeticoes))
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_obras_data_exibicao_id"))
+    relatorio("sem índice", medir(args.repeticoes))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        shutil.rmtree(_dir, ignore_errors=True)
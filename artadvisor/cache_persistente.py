@@ -0,0 +1,119 @@
+# cache_persistente.py — Cache em banco para respostas caras
+# Guarda respostas (ex.: completions da OpenAI) na tabela cache_respostas,
+# por namespace e chave = hash do pedido. Cada namespace tem TTL e número
+# máximo de entradas; ao passar do limite, sai o que foi usado há mais tempo.
+# Entradas vencidas continuam no banco até o despejo: servem de reserva se a
+# origem falhar e podem ser revalidadas com ETag/Last-Modified (304).
+# Abre uma sessão própria por operação (dá para usar de qualquer thread).
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from main import CacheResposta, SessionLocal
+
+
+def chave_de(*partes) -> str:
+    """sha256 do JSON canônico das partes (mesmo pedido → mesma chave)."""
+    canonico = json.dumps(partes, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+class Entrada:
+    """Uma entrada lida do cache, vencida ou não, com os validadores HTTP."""
+
+    def __init__(self, valor: str, vencida: bool, etag: Optional[str], last_modified: Optional[str]):
+        self.valor = valor
+        self.vencida = vencida
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def cabecalhos_condicionais(self) -> dict:
+        """If-None-Match / If-Modified-Since para revalidar na origem."""
+        cabecalhos = {}
+        if self.etag:
+            cabecalhos["If-None-Match"] = self.etag
+        if self.last_modified:
+            cabecalhos["If-Modified-Since"] = self.last_modified
+        return cabecalhos
+
+
+class CachePersistente:
+    """Cache chave → texto de um namespace, com TTL e despejo LRU."""
+
+    def __init__(self, namespace: str, ttl_segundos: float, max_entradas: int):
+        self.namespace = namespace
+        self.ttl = timedelta(seconds=ttl_segundos)
+        self.max_entradas = max_entradas
+
+    def obter(self, chave: str) -> Optional[str]:
+        """Valor guardado e ainda dentro do TTL, ou None."""
+        entrada = self.obter_entrada(chave)
+        if entrada is None or entrada.vencida:
+            return None
+        return entrada.valor
+
+    def obter_entrada(self, chave: str) -> Optional[Entrada]:
+        """A entrada guardada mesmo se vencida (marca `vencida`), ou None."""
+        db = SessionLocal()
+        try:
+            linha = db.get(CacheResposta, (self.namespace, chave))
+            if linha is None:
+                return None
+            agora = datetime.utcnow()
+            linha.usado_em = agora
+            db.commit()
+            return Entrada(linha.valor, agora - linha.criado_em > self.ttl, linha.etag, linha.last_modified)
+        finally:
+            db.close()
+
+    def renovar(self, chave: str):
+        """A origem confirmou que não mudou (304): a entrada vale mais um TTL."""
+        db = SessionLocal()
+        try:
+            linha = db.get(CacheResposta, (self.namespace, chave))
+            if linha is not None:
+                linha.criado_em = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+    def gravar(self, chave: str, valor: str, etag: Optional[str] = None,
+               last_modified: Optional[str] = None):
+        """Guarda (ou renova) a entrada e despeja as excedentes."""
+        agora = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.merge(CacheResposta(
+                namespace=self.namespace, chave=chave, valor=valor,
+                criado_em=agora, usado_em=agora, etag=etag, last_modified=last_modified,
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Outra thread gravou a mesma chave ao mesmo tempo: vale a dela
+                db.rollback()
+                return
+            self._despejar(db)
+        finally:
+            db.close()
+
+    def _despejar(self, db):
+        """Apaga as entradas menos usadas além de max_entradas."""
+        excedentes = [
+            chave for (chave,) in
+            db.query(CacheResposta.chave)
+            .filter(CacheResposta.namespace == self.namespace)
+            .order_by(CacheResposta.usado_em.desc())
+            .offset(self.max_entradas)
+            .all()
+        ]
+        if excedentes:
+            db.query(CacheResposta).filter(
+                CacheResposta.namespace == self.namespace,
+                CacheResposta.chave.in_(excedentes),
+            ).delete(synchronize_session=False)
+            db.commit()
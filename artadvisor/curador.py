@@ -4,18 +4,30 @@
 # 1. Lê o perfil de gosto (o que ela tem curtido).
 # 2. Pede ao GPT um termo de busca contemporâneo.
 # 3. Busca obras pós-1950 na API do Art Institute of Chicago.
-# 4. GPT traduz e cria tags em português.
+# 4. Ranqueia as candidatas pelo perfil inteiro; as melhores vão ao GPT,
+#    que traduz e cria tags em português.
 # 5. Salva no banco para a API servir de manhã.
+# 6. Pré-aquece o cache de imagens para o feed da manhã sair do disco.
 
 import os
 import requests
 import json
 import random
+import re
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from openai import OpenAI
 from datetime import date
+from typing import Optional
 
 # Importa os modelos e sessão do banco a partir do main.py
-from main import Obra, PerfilGosto, SessionLocal
+from main import Obra, PerfilGosto, TraducaoObra, SessionLocal, invalidar_feed, vincular_tags
+from imagens import aquecer_cache, resolver_rendicao, IMAGE_PREWARM_RENDICOES
+from cache_persistente import CachePersistente, chave_de
+from acervo import CAMPOS_ARTIC, indice_local
+from ranqueador import ranquear
 
 # ──────────────────────────────────────────────
 # CONFIGURAÇÃO
@@ -23,10 +35,38 @@ from main import Obra, PerfilGosto, SessionLocal
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "sk-sua-chave-openai-aqui")
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Cache das completions: mesmo modelo + mesmo prompt (normalizado) dentro do
+# TTL não vai de novo à OpenAI — reexecuções e /rodar-curadoria manuais saem
+# de graça. O TTL padrão (20h) deixa a curadoria da noite seguinte pedir de novo.
+LLM_CACHE_TTL_HORAS = float(os.getenv("LLM_CACHE_TTL_HORAS", "20"))
+LLM_CACHE_MAX_ENTRADAS = int(os.getenv("LLM_CACHE_MAX_ENTRADAS", "500"))
+cache_llm = CachePersistente("openai", LLM_CACHE_TTL_HORAS * 3600, LLM_CACHE_MAX_ENTRADAS)
+
 # Art Institute of Chicago API (gratuita, sem chave!)
 ARTIC_API_URL = "https://api.artic.edu/api/v1"
 ARTIC_IIIF_URL = "https://www.artic.edu/iiif/2"
 
+# Buscas no ARTIC: rodam em paralelo sobre uma sessão HTTP compartilhada
+# (keep-alive), com timeout de conexão/leitura em segundos.
+ARTIC_TIMEOUT = float(os.getenv("ARTIC_TIMEOUT", "15"))
+ARTIC_BUSCAS_PARALELAS = int(os.getenv("ARTIC_BUSCAS_PARALELAS", "4"))
+# Quantos termos aleatórios de TERMOS_CONTEMPORANEOS entram junto com o do GPT
+CURADORIA_TERMOS_EXTRAS = int(os.getenv("CURADORIA_TERMOS_EXTRAS", "1"))
+
+sessao_artic = requests.Session()
+sessao_artic.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=ARTIC_BUSCAS_PARALELAS))
+
+# Cache das respostas de busca, por (termo, campos, filtros, limite). Vencida,
+# a entrada é revalidada na origem (ETag/Last-Modified) e, se o ARTIC falhar
+# ou estiver lento, ainda serve de reserva.
+ARTIC_CACHE_TTL_HORAS = float(os.getenv("ARTIC_CACHE_TTL_HORAS", "24"))
+ARTIC_CACHE_MAX_ENTRADAS = int(os.getenv("ARTIC_CACHE_MAX_ENTRADAS", "1000"))
+# De onde vêm as buscas: "api" (ARTIC online), "local" (espelho do acervo.py)
+# ou "auto" (espelho local se ele já foi baixado, senão API)
+ARTIC_FONTE = os.getenv("ARTIC_FONTE", "auto")
+
+cache_artic = CachePersistente("artic_busca", ARTIC_CACHE_TTL_HORAS * 3600, ARTIC_CACHE_MAX_ENTRADAS)
+
 # Termos de busca para arte contemporânea / emergente
 TERMOS_CONTEMPORANEOS = [
     "contemporary painting 2000s",
@@ -52,38 +92,99 @@ TERMOS_CONTEMPORANEOS = [
 ]
 
 
+def completar(model: str, messages: list[dict], **opcoes) -> str:
+    """
+    chat.completions.create com cache: devolve o texto da primeira escolha.
+    A chave ignora diferenças de espaços em branco no prompt.
+    """
+    normalizadas = [
+        {**m, "content": re.sub(r"\s+", " ", m["content"]).strip()} for m in messages
+    ]
+    chave = chave_de(model, normalizadas, opcoes)
+    valor = cache_llm.obter(chave)
+    if valor is not None:
+        print("💾 Resposta do GPT reaproveitada do cache")
+        return valor
+
+    resposta = client.chat.completions.create(model=model, messages=messages, **opcoes)
+    valor = resposta.choices[0].message.content
+    cache_llm.gravar(chave, valor)
+    return valor
+
+
+def _buscar_artic(url: str, payload: dict) -> Optional[dict]:
+    """
+    POST de busca no ARTIC passando pelo cache. Devolve o JSON da resposta,
+    ou None se a origem falhou e não há nada guardado.
+    """
+    chave = chave_de(url, payload)
+    entrada = cache_artic.obter_entrada(chave)
+    if entrada and not entrada.vencida:
+        print(f"💾 Busca '{payload['q']}' servida do cache")
+        return json.loads(entrada.valor)
+
+    cabecalhos = entrada.cabecalhos_condicionais() if entrada else {}
+    try:
+        resp = sessao_artic.post(url, json=payload, headers=cabecalhos, timeout=ARTIC_TIMEOUT)
+    except requests.RequestException as e:
+        resp = None
+        erro = str(e)
+    else:
+        erro = resp.text
+
+    if resp is not None and resp.status_code == 304 and entrada:
+        cache_artic.renovar(chave)
+        return json.loads(entrada.valor)
+    if resp is not None and resp.status_code == 200:
+        cache_artic.gravar(
+            chave, resp.text,
+            etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"),
+        )
+        return resp.json()
+
+    print(f"❌ Erro na busca '{payload['q']}': {erro}")
+    if entrada:
+        print("♻️ Usando resposta vencida do cache")
+        return json.loads(entrada.valor)
+    return None
+
+
 def buscar_obras_contemporaneas(termo: str, limite: int = 20) -> list[dict]:
     """
     Busca obras CONTEMPORÂNEAS no Art Institute of Chicago.
     Usa filtros para pegar obras pós-1950 com imagem.
     """
     print(f"🏛️ Buscando arte contemporânea: {termo}")
+    data_min, data_max = 1985, 2030
 
     # Busca com filtros via Elasticsearch query avançada (POST para garantir complexidade)
     url = f"{ARTIC_API_URL}/artworks/search"
     payload = {
         "q": termo,
-        "fields": [
-            "id", "title", "image_id", "artist_title", "date_end",
-            "style_titles", "classification_titles", "term_titles", "department_title"
-        ],
+        "fields": CAMPOS_ARTIC,
         "limit": limite,
         "query": {
             "bool": {
                 "must": [
-                    {"range": {"date_end": {"gte": 1985, "lte": 2030}}},
+                    {"range": {"date_end": {"gte": data_min, "lte": data_max}}},
                     {"exists": {"field": "image_id"}},
                 ],
             }
         },
     }
 
-    resp = requests.post(url, json=payload)
-    if resp.status_code != 200:
-        print(f"❌ Erro na busca: {resp.text}")
+    indice = indice_local() if ARTIC_FONTE in ("auto", "local") else None
+    if indice is not None:
+        # Mesma busca no espelho local: sem rede, determinística
+        dados = {"data": indice.buscar(termo, limite, data_min, data_max)}
+    elif ARTIC_FONTE == "local":
+        print("❌ ARTIC_FONTE=local, mas não há espelho (rode: python acervo.py baixar)")
+        return []
+    else:
+        dados = _buscar_artic(url, payload)
+    if dados is None:
         return []
 
-    dados = resp.json()
     iiif_url = dados.get("config", {}).get("iiif_url", ARTIC_IIIF_URL)
     items = dados.get("data", [])
 
@@ -102,6 +203,7 @@ def buscar_obras_contemporaneas(termo: str, limite: int = 20) -> list[dict]:
         depto = item.get("department_title", "")
 
         obras.append({
+            "artic_id": item.get("id"),
             "titulo_original": item.get("title", "Untitled"),
             "artista": item.get("artist_title", "Unknown"),
             "ano": ano,
@@ -114,27 +216,97 @@ def buscar_obras_contemporaneas(termo: str, limite: int = 20) -> list[dict]:
     return obras
 
 
+def buscar_varios_termos(termos: list[str], limite: int = 20) -> list[dict]:
+    """
+    Roda uma busca por termo em paralelo e combina os resultados na ordem dos
+    termos, sem repetir image_id. O tempo total é o da busca mais lenta.
+    """
+    if not termos:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(termos), ARTIC_BUSCAS_PARALELAS)) as executor:
+        resultados = list(executor.map(lambda t: buscar_obras_contemporaneas(t, limite), termos))
+
+    vistas = set()
+    combinadas = []
+    for obras in resultados:
+        for obra in obras:
+            if obra["image_id"] not in vistas:
+                vistas.add(obra["image_id"])
+                combinadas.append(obra)
+    return combinadas
+
+
+def traducoes_conhecidas(artic_ids: list[int]) -> dict[int, dict]:
+    """Traduções já guardadas: {artic_id: {'titulo', 'artista', 'tags', 'tags_api'}}."""
+    ids = [i for i in artic_ids if i is not None]
+    if not ids:
+        return {}
+    db = SessionLocal()
+    try:
+        return {
+            t.artic_id: {"titulo": t.titulo, "artista": t.artista, "tags": t.tags, "tags_api": t.tags_api or ""}
+            for t in db.query(TraducaoObra).filter(TraducaoObra.artic_id.in_(ids)).all()
+        }
+    finally:
+        db.close()
+
+
+def guardar_traducoes(traducoes: dict[int, dict]):
+    """Grava (ou atualiza) as traduções novas por artic_id."""
+    if not traducoes:
+        return
+    db = SessionLocal()
+    try:
+        for artic_id, t in traducoes.items():
+            db.merge(TraducaoObra(
+                artic_id=artic_id, titulo=t["titulo"], artista=t["artista"], tags=t["tags"],
+                tags_api=t.get("tags_api", ""),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
 def traduzir_e_taguear(obras: list[dict]) -> list[dict]:
     """
     Usa o GPT para traduzir títulos e criar tags em português.
     Foco em valorizar o artista contemporâneo e a técnica.
+
+    O GPT traduz TODAS as obras novas do prompt (não só as que escolhe) e
+    as traduções vão para a tabela traducoes_obras: as obras que ele não
+    escolheu hoje são justamente as que podem voltar nas buscas de amanhã.
+    Obras já traduzidas entram só com índice, título e tags em português:
+    o GPT apenas as escolhe ou não, e a tradução vem do banco.
     """
     if not obras:
         return []
 
-    print("🧠 Pedindo ao GPT para curar e traduzir...")
+    conhecidas = traducoes_conhecidas([obra.get("artic_id") for obra in obras])
+    print(
+        f"🧠 Pedindo ao GPT para curar e traduzir... "
+        f"({len(obras) - len(conhecidas)} novas, {len(conhecidas)} já traduzidas)"
+    )
 
-    lista_obras = []
+    lista_novas, lista_conhecidas = [], []
     for i, obra in enumerate(obras):
-        lista_obras.append({
-            "index": i,
-            "titulo": obra["titulo_original"],
-            "artista": obra["artista"],
-            "ano": obra["ano"],
-            "tags_api": obra["tags_api"],
-        })
-
-    resposta = client.chat.completions.create(
+        traducao = conhecidas.get(obra.get("artic_id"))
+        if traducao:
+            lista_conhecidas.append({"index": i, "titulo": traducao["titulo"], "tags": traducao["tags"]})
+        else:
+            lista_novas.append({
+                "index": i,
+                "titulo": obra["titulo_original"],
+                "artista": obra["artista"],
+                "ano": obra["ano"],
+                "tags_api": obra["tags_api"],
+            })
+
+    instrucoes_conhecidas = (
+        f"Obras já traduzidas (não traduza de novo, só escolha): "
+        f"{json.dumps(lista_conhecidas, ensure_ascii=False)}\n\n"
+        if lista_conhecidas else ""
+    )
+    conteudo = completar(
         model="gpt-4o-mini",
         response_format={"type": "json_object"},
         messages=[
@@ -145,117 +317,296 @@ def traduzir_e_taguear(obras: list[dict]) -> list[dict]:
                     "emergentes e independentes. Receba esta lista e selecione as 10 obras "
                     "mais interessantes e visualmente impactantes. Priorize obras de "
                     "artistas menos conhecidos e técnicas inovadoras.\n\n"
-                    "Retorne um JSON com a chave 'obras' contendo um array. Para cada obra:\n"
-                    "- 'index': índice original\n"
-                    "- 'titulo': título poético traduzido para português\n"
-                    "- 'artista': nome do artista original\n"
-                    "- 'tags': 3 palavras-chave de estilo/técnica em português (separadas por vírgula)\n\n"
-                    f"Obras: {json.dumps(lista_obras, ensure_ascii=False)}"
+                    "Retorne um JSON com duas chaves:\n"
+                    "- 'traducoes': um array com TODAS as obras novas (escolhidas ou não), cada uma com:\n"
+                    "  - 'index': índice original\n"
+                    "  - 'titulo': título poético traduzido para português\n"
+                    "  - 'artista': nome do artista original\n"
+                    "  - 'tags': 3 palavras-chave de estilo/técnica em português (separadas por vírgula)\n"
+                    "- 'selecionadas': array com os índices das obras escolhidas (novas ou já traduzidas)\n\n"
+                    f"{instrucoes_conhecidas}"
+                    f"Obras novas: {json.dumps(lista_novas, ensure_ascii=False)}"
                 ),
             }
         ],
     )
 
-    resultado = json.loads(resposta.choices[0].message.content)
-    obras_traduzidas = resultado.get("obras", [])
-    print(f"🎨 GPT selecionou {len(obras_traduzidas)} obras contemporâneas")
+    resultado = json.loads(conteudo)
+    traducoes = {}  # índice → tradução (as do banco e as novas desta resposta)
+    novas_traducoes = {}
+    for i, obra in enumerate(obras):
+        traducao = conhecidas.get(obra.get("artic_id"))
+        if traducao:
+            traducoes[i] = traducao
+            if not traducao["tags_api"] and obra["tags_api"]:
+                # Traduzida antes de as tags do ARTIC serem guardadas: completa
+                novas_traducoes[obra["artic_id"]] = {**traducao, "tags_api": ", ".join(obra["tags_api"])}
+
+    for traduzida in resultado.get("traducoes", []):
+        idx = traduzida.get("index")
+        if not isinstance(idx, int) or not 0 <= idx < len(obras) or idx in traducoes:
+            continue
+        if not traduzida.get("titulo"):
+            continue
+        traducoes[idx] = {
+            "titulo": traduzida["titulo"],
+            "artista": traduzida.get("artista") or obras[idx]["artista"],
+            "tags": traduzida.get("tags", ""),
+            "tags_api": ", ".join(obras[idx]["tags_api"]),
+        }
+        if obras[idx].get("artic_id") is not None:
+            novas_traducoes[obras[idx]["artic_id"]] = traducoes[idx]
+
+    guardar_traducoes(novas_traducoes)
+
+    obras_traduzidas = []
+    for idx in dict.fromkeys(resultado.get("selecionadas", [])):
+        if isinstance(idx, int) and idx in traducoes:
+            t = traducoes[idx]
+            obras_traduzidas.append({"index": idx, "titulo": t["titulo"], "artista": t["artista"], "tags": t["tags"]})
+
+    print(
+        f"🎨 GPT selecionou {len(obras_traduzidas)} obras contemporâneas "
+        f"({len(novas_traducoes)} traduções guardadas)"
+    )
     return obras_traduzidas
 
 
-def rodar_curadoria():
-    """Pipeline completo de curadoria diária — foco contemporâneo."""
-    print("=" * 50)
-    print("🤖 ROBÔ CURADOR — Curadoria Contemporânea")
-    print("=" * 50)
-
-    db = SessionLocal()
-
+def aquecer_imagens(image_ids: list[str]) -> tuple[int, float]:
+    """
+    Baixa as imagens do dia para o cache do proxy antes do primeiro acesso.
+    Retorna (arquivos gravados — um por imagem e tamanho —, segundos gastos).
+    """
+    print(f"🔥 Aquecendo cache de {len(image_ids)} imagens...")
+    inicio = time.perf_counter()
     try:
-        # 1. Lê a memória: O que ela tem curtido mais?
-        top_tags = (
-            db.query(PerfilGosto)
-            .order_by(PerfilGosto.peso.desc())
-            .limit(3)
-            .all()
-        )
-        gosto_str = (
-            ", ".join([t.tag for t in top_tags])
-            if top_tags
-            else "contemporary abstract, mixed media, texture"
-        )
-        print(f"💭 Gostos atuais: {gosto_str}")
-
-        # 2. Pede ao GPT um termo focado em arte contemporânea
-        resp_termo = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": (
-                        f"Crie um termo de busca curto em inglês para encontrar "
-                        f"ARTE CONTEMPORÂNEA de artistas atuais e independentes, "
-                        f"focado nestes estilos: {gosto_str}. "
-                        f"Inclua palavras como 'contemporary', 'modern', 'emerging'. "
-                        f"Retorne APENAS o termo, sem aspas ou explicações."
-                    ),
-                }
-            ],
-        )
-        termo_gpt = resp_termo.choices[0].message.content.strip().strip('"')
+        aquecidas = asyncio.run(aquecer_cache(image_ids))
+    except Exception as e:
+        print(f"⚠️ Erro ao aquecer cache de imagens: {e}")
+        aquecidas = 0
+    duracao = time.perf_counter() - inicio
+    tamanhos = len([r for r in IMAGE_PREWARM_RENDICOES if resolver_rendicao(r)])
+    print(
+        f"🔥 Cache aquecido: {aquecidas}/{len(set(image_ids)) * tamanhos} arquivos "
+        f"({len(set(image_ids))} imagens × {tamanhos} tamanhos) em {duracao:.1f}s"
+    )
+    return aquecidas, duracao
 
-        # Também escolhe um termo aleatório da lista para variar
-        termo_extra = random.choice(TERMOS_CONTEMPORANEOS)
 
-        print(f"🔎 Termo GPT: {termo_gpt}")
-        print(f"🔎 Termo extra: {termo_extra}")
+class GrafoDeEtapas:
+    """
+    Mini-orquestrador do pipeline: cada etapa declara de quais outras depende
+    e começa assim que todas terminam (etapas independentes rodam em paralelo).
+    Guarda início/fim de cada etapa para o relatório de tempos.
+    """
 
-        # 3. Busca com os dois termos e combina resultados
-        obras_gpt = buscar_obras_contemporaneas(termo_gpt)
-        obras_extra = buscar_obras_contemporaneas(termo_extra)
+    def __init__(self):
+        self.etapas = {}   # nome → (função, dependências)
+        self.tempos = {}   # nome → (início, fim) em segundos desde o começo
+
+    def etapa(self, nome: str, funcao, depende_de: tuple = ()):
+        """Registra `funcao`, chamada com os resultados de `depende_de` (na ordem)."""
+        self.etapas[nome] = (funcao, tuple(depende_de))
+
+    def rodar(self, max_workers: int = 4) -> dict:
+        """Roda tudo e devolve {nome: resultado}. Um erro cancela o que falta."""
+        resultados = {}
+        pendentes = dict(self.etapas)
+        origem = time.perf_counter()
+
+        def cronometrar(nome, funcao, args):
+            inicio = time.perf_counter() - origem
+            try:
+                return funcao(*args)
+            finally:
+                self.tempos[nome] = (inicio, time.perf_counter() - origem)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            em_voo = {}
+            while pendentes or em_voo:
+                prontas = [
+                    nome for nome, (_, deps) in pendentes.items()
+                    if all(d in resultados for d in deps)
+                ]
+                for nome in prontas:
+                    funcao, deps = pendentes.pop(nome)
+                    args = [resultados[d] for d in deps]
+                    em_voo[executor.submit(cronometrar, nome, funcao, args)] = nome
+                if not em_voo:
+                    raise RuntimeError(f"Dependências impossíveis: {sorted(pendentes)}")
+
+                feitas, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+                for futuro in feitas:
+                    nome = em_voo.pop(futuro)
+                    try:
+                        resultados[nome] = futuro.result()
+                    except Exception:
+                        for outro in em_voo:
+                            outro.cancel()
+                        raise
+        return resultados
+
+    def relatorio(self):
+        """Imprime a linha do tempo das etapas, na ordem em que começaram."""
+        print("⏱️ Tempos por etapa:")
+        for nome, (inicio, fim) in sorted(self.tempos.items(), key=lambda t: t[1][0]):
+            print(f"   {nome:<14} +{inicio:6.2f}s → +{fim:6.2f}s  ({fim - inicio:.2f}s)")
+
+
+def ler_gosto(db) -> str:
+    """O que ela tem curtido mais (e mais recentemente), como texto para o prompt."""
+    top_tags = (
+        db.query(PerfilGosto)
+        .order_by(PerfilGosto.score_acumulado.desc())
+        .limit(3)
+        .all()
+    )
+    gosto_str = (
+        ", ".join([t.tag for t in top_tags])
+        if top_tags
+        else "contemporary abstract, mixed media, texture"
+    )
+    print(f"💭 Gostos atuais: {gosto_str}")
+    return gosto_str
 
-        # Combina e remove duplicatas por image_id
-        vistas = set()
-        todas_obras = []
-        for obra in obras_gpt + obras_extra:
-            if obra["image_id"] not in vistas:
-                vistas.add(obra["image_id"])
-                todas_obras.append(obra)
 
-        if not todas_obras:
-            print("⚠️ Nenhuma obra encontrada. Encerrando.")
-            return
+def gerar_termo_gpt(gosto_str: str) -> str:
+    """Pede ao GPT um termo de busca focado em arte contemporânea."""
+    resp_termo = completar(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "user",
+                "content": (
+                    f"Crie um termo de busca curto em inglês para encontrar "
+                    f"ARTE CONTEMPORÂNEA de artistas atuais e independentes, "
+                    f"focado nestes estilos: {gosto_str}. "
+                    f"Inclua palavras como 'contemporary', 'modern', 'emerging'. "
+                    f"Retorne APENAS o termo, sem aspas ou explicações."
+                ),
+            }
+        ],
+    )
+    termo_gpt = resp_termo.strip().strip('"')
+    print(f"🔎 Termo GPT: {termo_gpt}")
+    return termo_gpt
+
+
+def combinar_candidatas(db, obras_gpt: list[dict], obras_extras: list[dict]) -> list[dict]:
+    """Junta as buscas sem duplicatas e tira o que já passou no feed."""
+    vistas = set()
+    todas_obras = []
+    for obra in obras_gpt + obras_extras:
+        if obra["image_id"] not in vistas:
+            vistas.add(obra["image_id"])
+            todas_obras.append(obra)
+
+    # Não repete obras que já passaram no feed (busca pelo índice de imagem_url)
+    ja_exibidas = {
+        url for (url,) in
+        db.query(Obra.imagem_url).filter(Obra.imagem_url.in_(vistas)).all()
+    }
+    todas_obras = [o for o in todas_obras if o["image_id"] not in ja_exibidas]
 
+    if todas_obras:
         print(f"📦 Total combinado (sem duplicatas): {len(todas_obras)} obras")
+    else:
+        print("⚠️ Nenhuma obra encontrada. Encerrando.")
+    return todas_obras
+
+
+def ranquear_candidatas(db, obras: list[dict]) -> list[dict]:
+    """Ordena pelo perfil de gosto (com as tags em português já conhecidas) e corta no top-N."""
+    conhecidas = traducoes_conhecidas([obra.get("artic_id") for obra in obras])
+    tags_pt = {artic_id: t["tags"] for artic_id, t in conhecidas.items()}
+    return ranquear(obras, db, tags_pt)
+
+
+def salvar_obras(db, todas_obras: list[dict], obras_traduzidas: list[dict]) -> list[str]:
+    """Grava as obras escolhidas com data de hoje e devolve os image_ids."""
+    hoje = date.today()
+    image_ids = []
+    for obra_trad in obras_traduzidas:
+        idx = obra_trad.get("index", 0)
+        if idx < len(todas_obras):
+            obra_original = todas_obras[idx]
+            artista = obra_trad.get("artista", obra_original["artista"])
+            titulo = obra_trad.get("titulo", "Sem título")
+
+            nova_obra = Obra(
+                titulo=f"{titulo} — {artista}",
+                imagem_url=obra_original["image_id"],
+                tags_extraidas=obra_trad.get("tags", ""),
+                data_exibicao=hoje,
+            )
+            db.add(nova_obra)
+            vincular_tags(db, nova_obra, nova_obra.tags_extraidas)
+            image_ids.append(obra_original["image_id"])
+
+    if not image_ids:
+        return []
+    db.commit()
+    invalidar_feed()
+    print(f"\n🎨 Curadoria concluída! {len(image_ids)} obras contemporâneas salvas.")
+    return image_ids
 
-        # 4. GPT curates and translates
-        obras_traduzidas = traduzir_e_taguear(todas_obras)
-
-        # 5. Salva no Banco de Dados
-        hoje = date.today()
-        for obra_trad in obras_traduzidas:
-            idx = obra_trad.get("index", 0)
-            if idx < len(todas_obras):
-                obra_original = todas_obras[idx]
-                artista = obra_trad.get("artista", obra_original["artista"])
-                titulo = obra_trad.get("titulo", "Sem título")
-
-                nova_obra = Obra(
-                    titulo=f"{titulo} — {artista}",
-                    imagem_url=obra_original["image_id"],
-                    tags_extraidas=obra_trad.get("tags", ""),
-                    data_exibicao=hoje,
-                )
-                db.add(nova_obra)
 
-        db.commit()
-        count = len(obras_traduzidas)
-        print(f"\n🎨 Curadoria concluída! {count} obras contemporâneas salvas.")
+def rodar_curadoria():
+    """
+    Pipeline completo de curadoria diária — foco contemporâneo.
+
+    As etapas formam um grafo: a busca dos termos aleatórios não depende do
+    GPT e roda enquanto ele gera o termo personalizado.
+
+        gosto → termo_gpt → busca_gpt ┐
+                          busca_extra ┴→ candidatas → ranking → traducao → salvar → aquecer
+    """
+    print("=" * 50)
+    print("🤖 ROBÔ CURADOR — Curadoria Contemporânea")
+    print("=" * 50)
+
+    db = SessionLocal()
+
+    # Termos aleatórios da lista para variar (conhecidos antes do GPT responder)
+    termos_extras = random.sample(
+        TERMOS_CONTEMPORANEOS, min(CURADORIA_TERMOS_EXTRAS, len(TERMOS_CONTEMPORANEOS))
+    )
+    for termo_extra in termos_extras:
+        print(f"🔎 Termo extra: {termo_extra}")
+
+    grafo = GrafoDeEtapas()
+    # 1. Lê a memória: o que ela tem curtido
+    grafo.etapa("gosto", lambda: ler_gosto(db))
+    # 2. Pede ao GPT um termo focado em arte contemporânea
+    grafo.etapa("termo_gpt", gerar_termo_gpt, depende_de=("gosto",))
+    # 3. Busca os termos (a busca extra começa já, junto com a etapa 1)
+    grafo.etapa("busca_extra", lambda: buscar_varios_termos(termos_extras))
+    grafo.etapa("busca_gpt", lambda termo: buscar_varios_termos([termo]), depende_de=("termo_gpt",))
+    grafo.etapa(
+        "candidatas",
+        lambda gpt, extras: combinar_candidatas(db, gpt, extras),
+        depende_de=("busca_gpt", "busca_extra"),
+    )
+    # 4. Ranqueia pelo perfil inteiro; o GPT cura e traduz só as melhores
+    grafo.etapa("ranking", lambda obras: ranquear_candidatas(db, obras), depende_de=("candidatas",))
+    grafo.etapa("traducao", traduzir_e_taguear, depende_de=("ranking",))
+    # 5. Salva no banco de dados
+    grafo.etapa(
+        "salvar",
+        lambda obras, traduzidas: salvar_obras(db, obras, traduzidas),
+        depende_de=("ranking", "traducao"),
+    )
+    # 6. Pré-aquece o cache de imagens (falha aqui não desfaz a curadoria)
+    grafo.etapa("aquecer", lambda ids: aquecer_imagens(ids) if ids else None, depende_de=("salvar",))
 
+    try:
+        grafo.rodar()
     except Exception as e:
         print(f"❌ Erro na curadoria: {e}")
         db.rollback()
     finally:
         db.close()
+        grafo.relatorio()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,534 @@
+# imagens.py — Cache de Imagens (A Despensa)
+# Guarda em disco as imagens IIIF do Art Institute of Chicago.
+# Cada arquivo é endereçado por image_id + especificação de tamanho IIIF,
+# com orçamento de bytes configurável e despejo LRU.
+# Quando o Pillow está instalado, guarda também versões WebP/AVIF.
+
+import os
+import io
+import asyncio
+import hashlib
+import threading
+import uuid
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow é opcional: sem ele, só JPEG
+    Image = None
+
+# ──────────────────────────────────────────────
+# CONFIGURAÇÃO
+# ──────────────────────────────────────────────
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./cache_imagens")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_MB", "500")) * 1024 * 1024
+
+# Tamanho de cada pedaço repassado do IIIF para o cliente (buffer limitado)
+CHUNK_BYTES = int(os.getenv("IMAGE_CHUNK_KB", "64")) * 1024
+
+# Cliente HTTP compartilhado com o IIIF (pool de conexões keep-alive)
+IMAGE_MAX_CONNECTIONS = int(os.getenv("IMAGE_MAX_CONNECTIONS", "20"))
+IMAGE_HTTP2 = os.getenv("IMAGE_HTTP2", "1") == "1"
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", "15"))
+
+# Downloads simultâneos ao aquecer o cache depois da curadoria
+IMAGE_PREWARM_CONCURRENCY = int(os.getenv("IMAGE_PREWARM_CONCURRENCY", "4"))
+
+# Renditions: largura em pixels de cada uso no app (redimensionado pelo IIIF)
+RENDICOES = {"thumb": 200, "card": 400, "full": 843}
+RENDICAO_PADRAO = "full"
+# Maior largura aceita quando o cliente pede um número em vez de um nome
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", "1686"))
+# Renditions baixadas no pré-aquecimento da curadoria
+IMAGE_PREWARM_RENDICOES = os.getenv("IMAGE_PREWARM_RENDICOES", ",".join(RENDICOES)).split(",")
+
+# Formatos modernos gerados a partir do JPEG (em ordem de preferência)
+IMAGE_FORMATOS = os.getenv("IMAGE_FORMATOS", "avif,webp").split(",")
+IMAGE_TRANSCODE_WORKERS = int(os.getenv("IMAGE_TRANSCODE_WORKERS", "2"))
+QUALIDADE = {"webp": 80, "avif": 60}
+
+MEDIA_TYPES = {"jpg": "image/jpeg", "webp": "image/webp", "avif": "image/avif"}
+
+ARTIC_IIIF_URL = "https://www.artic.edu/iiif/2"
+
+HEADERS_IIIF = {
+    "User-Agent": "ArtAdvisor/1.0 (Educational Project)",
+    "Referer": "https://www.artic.edu/",
+    "Accept": "image/jpeg,image/*",
+}
+
+
+def tamanho_iiif(largura: int) -> str:
+    """Especificação IIIF (região/tamanho/rotação/qualidade) para uma largura."""
+    return f"full/{largura},/0/default.jpg"
+
+
+def resolver_rendicao(rendicao: str):
+    """
+    Converte o nome de uma rendition ('thumb', 'card', 'full') ou uma largura
+    numérica (até IMAGE_MAX_WIDTH) na especificação IIIF. None se inválida.
+    """
+    if rendicao in RENDICOES:
+        return tamanho_iiif(RENDICOES[rendicao])
+    # isdigit() sozinho aceita dígitos Unicode ('²') que o int() rejeita
+    if rendicao.isascii() and rendicao.isdigit() and 0 < int(rendicao) <= IMAGE_MAX_WIDTH:
+        return tamanho_iiif(int(rendicao))
+    return None
+
+
+TAMANHO_PADRAO = tamanho_iiif(RENDICOES[RENDICAO_PADRAO])
+
+
+def url_iiif(image_id: str, tamanho: str = TAMANHO_PADRAO) -> str:
+    """Monta a URL IIIF de uma imagem no tamanho pedido."""
+    return f"{ARTIC_IIIF_URL}/{image_id}/{tamanho}"
+
+
+def criar_cliente_iiif() -> httpx.AsyncClient:
+    """
+    Cria o cliente assíncrono usado para falar com o IIIF.
+    Deve viver o processo inteiro: as conexões (e o handshake TLS) são
+    reaproveitadas entre requisições. Usa HTTP/2 se o pacote h2 existir.
+    """
+    try:
+        import h2  # noqa: F401
+        http2 = IMAGE_HTTP2
+    except ImportError:
+        http2 = False
+
+    return httpx.AsyncClient(
+        headers=HEADERS_IIIF,
+        http2=http2,
+        timeout=IMAGE_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=IMAGE_MAX_CONNECTIONS,
+            max_keepalive_connections=IMAGE_MAX_CONNECTIONS,
+        ),
+    )
+
+
+# ──────────────────────────────────────────────
+# CACHE EM DISCO
+# ──────────────────────────────────────────────
+class CacheImagens:
+    """
+    Cache em disco endereçado por conteúdo pedido (image_id + tamanho IIIF).
+    O mtime de cada arquivo marca o último acesso; quando o total passa do
+    orçamento, os arquivos menos usados recentemente são apagados.
+    """
+
+    def __init__(self, diretorio: str, max_bytes: int):
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total = None  # calculado preguiçosamente no primeiro uso
+        self._etags = {}  # caminho → (inode, tamanho, etag)
+        os.makedirs(diretorio, exist_ok=True)
+
+    def caminho(self, image_id: str, tamanho: str = TAMANHO_PADRAO,
+                formato: str = "jpg") -> str:
+        """Caminho do arquivo no disco — dois níveis para não lotar um diretório."""
+        chave = hashlib.sha256(f"{image_id}/{tamanho}".encode()).hexdigest()
+        return os.path.join(self.diretorio, chave[:2], f"{chave}.{formato}")
+
+    def obter(self, image_id: str, tamanho: str = TAMANHO_PADRAO, formato: str = "jpg"):
+        """Retorna o caminho do arquivo se estiver em cache (e marca o acesso)."""
+        caminho = self.caminho(image_id, tamanho, formato)
+        try:
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return caminho
+
+    def marcar_sem_ganho(self, image_id: str, tamanho: str, formato: str):
+        """
+        Registra (arquivo vazio) que converter para `formato` não deixou a
+        imagem menor que o JPEG, para não tentar de novo a cada acesso.
+        Sai junto no despejo LRU, como os demais arquivos.
+        """
+        marcador = self.caminho(image_id, tamanho, f"{formato}.sem-ganho")
+        os.makedirs(os.path.dirname(marcador), exist_ok=True)
+        open(marcador, "wb").close()
+
+    def ja_tentado(self, image_id: str, tamanho: str, formato: str) -> bool:
+        """O formato já existe no cache ou já se sabe que não vale a pena."""
+        return (
+            os.path.exists(self.caminho(image_id, tamanho, formato))
+            or os.path.exists(self.caminho(image_id, tamanho, f"{formato}.sem-ganho"))
+        )
+
+    def gravar(self, image_id: str, conteudo: bytes, tamanho: str = TAMANHO_PADRAO) -> str:
+        """Grava a imagem de forma atômica (arquivo temporário + rename)."""
+        gravacao = self.abrir_gravacao(image_id, tamanho)
+        gravacao.escrever(conteudo)
+        return gravacao.concluir()
+
+    def abrir_gravacao(self, image_id: str, tamanho: str = TAMANHO_PADRAO,
+                       formato: str = "jpg") -> "Gravacao":
+        """Abre uma gravação incremental — usada para gravar enquanto repassa."""
+        return Gravacao(self, self.caminho(image_id, tamanho, formato))
+
+    def etag(self, caminho: str) -> str:
+        """
+        ETag forte (hash do conteúdo) de um arquivo do cache.
+        Calculado ao gravar; depois de reiniciar, lido do disco uma vez.
+        """
+        st = os.stat(caminho)
+        memo = self._etags.get(caminho)
+        if memo and memo[:2] == (st.st_ino, st.st_size):
+            return memo[2]
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as f:
+            for pedaco in iter(lambda: f.read(CHUNK_BYTES), b""):
+                sha.update(pedaco)
+        return self._memorizar_etag(caminho, f'"{sha.hexdigest()[:32]}"')
+
+    def _memorizar_etag(self, caminho: str, etag: str) -> str:
+        # Toda gravação é um rename de arquivo novo: o inode muda junto
+        # com o conteúdo (o mtime não serve, obter() o atualiza a cada hit)
+        st = os.stat(caminho)
+        self._etags[caminho] = (st.st_ino, st.st_size, etag)
+        return etag
+
+    def _registrar(self, temporario: str, caminho: str):
+        """Move o temporário para o lugar final e respeita o orçamento."""
+        with self._lock:
+            total = self._calcular_total()
+            try:
+                total -= os.path.getsize(caminho)
+            except FileNotFoundError:
+                pass
+            os.replace(temporario, caminho)
+            self._total = total + os.path.getsize(caminho)
+            if self._total > self.max_bytes:
+                self._despejar()
+
+    def _arquivos(self):
+        for raiz, _, nomes in os.walk(self.diretorio):
+            for nome in nomes:
+                if nome.endswith(".tmp"):
+                    continue
+                caminho = os.path.join(raiz, nome)
+                try:
+                    st = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                yield caminho, st.st_size, st.st_mtime
+
+    def _calcular_total(self) -> int:
+        if self._total is None:
+            self._total = sum(tamanho for _, tamanho, _ in self._arquivos())
+        return self._total
+
+    def _despejar(self):
+        """Apaga os arquivos menos usados até voltar a 90% do orçamento."""
+        alvo = int(self.max_bytes * 0.9)
+        arquivos = sorted(self._arquivos(), key=lambda a: a[2])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        removidos = 0
+        for caminho, tamanho, _ in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            self._etags.pop(caminho, None)
+            total -= tamanho
+            removidos += 1
+        self._total = total
+        print(f"🧹 Cache de imagens: {removidos} arquivos despejados ({total // 1024} KB em uso)")
+
+
+class Gravacao:
+    """
+    Escrita de uma imagem em pedaços num arquivo temporário.
+    Só entra no cache ao concluir; se o download falhar, é descartada.
+    """
+
+    def __init__(self, cache: CacheImagens, caminho: str):
+        self.cache = cache
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.temporario = f"{caminho}.{uuid.uuid4().hex}.tmp"
+        self._arquivo = open(self.temporario, "wb")
+        self._sha = hashlib.sha256()
+        self.escritos = 0  # bytes já visíveis para quem lê o temporário
+
+    def escrever(self, pedaco: bytes):
+        self._arquivo.write(pedaco)
+        self._arquivo.flush()
+        self._sha.update(pedaco)
+        self.escritos += len(pedaco)
+
+    def concluir(self) -> str:
+        self._arquivo.close()
+        self.cache._registrar(self.temporario, self.caminho)
+        self.cache._memorizar_etag(self.caminho, f'"{self._sha.hexdigest()[:32]}"')
+        return self.caminho
+
+    def descartar(self):
+        self._arquivo.close()
+        try:
+            os.remove(self.temporario)
+        except FileNotFoundError:
+            pass
+
+
+# ──────────────────────────────────────────────
+# COALESCÊNCIA (SINGLE-FLIGHT)
+# ──────────────────────────────────────────────
+class Voo:
+    """
+    Um download do IIIF em andamento, feito por uma task própria: não
+    depende de nenhum cliente ler a resposta. Nada fica em memória: cada
+    leitor (o primeiro pedido e os que chegaram depois) abre o arquivo da
+    Gravacao e o segue no próprio ritmo, até onde já foi escrito.
+    """
+
+    def __init__(self):
+        self.gravacao = None
+        self.status = None
+        self.headers = {}
+        self.respondeu = asyncio.Event()  # status e headers do IIIF chegaram
+        self.terminou = False
+        self.falhou = False  # erro do IIIF ou download interrompido
+        self._novo = asyncio.Event()
+
+    def _avisar(self):
+        # Um evento por "rodada": acorda todos os leitores de uma vez
+        evento, self._novo = self._novo, asyncio.Event()
+        evento.set()
+
+    def _abrir(self):
+        # O descritor aberto continua válido depois do rename (ou do despejo);
+        # quem chega depois do rename lê o arquivo já no lugar final
+        for caminho in (self.gravacao.temporario, self.gravacao.caminho):
+            try:
+                return open(caminho, "rb")
+            except FileNotFoundError:
+                continue
+        raise RuntimeError("Download da imagem interrompido")
+
+    async def ler(self):
+        """Gerador com a imagem inteira, do primeiro pedaço ao último."""
+        arquivo = await asyncio.to_thread(self._abrir)
+        try:
+            lidos = 0
+            while True:
+                evento = self._novo
+                while lidos < self.gravacao.escritos:
+                    falta = self.gravacao.escritos - lidos
+                    pedaco = await asyncio.to_thread(arquivo.read, min(CHUNK_BYTES, falta))
+                    if not pedaco:
+                        break
+                    lidos += len(pedaco)
+                    yield pedaco
+                if self.terminou and (self.falhou or lidos >= self.gravacao.escritos):
+                    if self.falhou:
+                        # Corta a resposta: o cliente vê erro, não imagem pela metade
+                        raise RuntimeError("Download da imagem interrompido")
+                    return
+                await evento.wait()
+        finally:
+            arquivo.close()
+
+
+class VoosEmAndamento:
+    """
+    Garante um único download por imagem ao mesmo tempo.
+    O primeiro pedido abre o voo, que baixa do IIIF para o cache numa task
+    separada; todos os pedidos (inclusive o primeiro) leem do voo. Um
+    cliente lento ou que desistiu não segura os outros nem a gravação.
+    Só roda dentro do event loop do servidor.
+    """
+
+    def __init__(self):
+        self._voos: dict[str, Voo] = {}
+        self._tasks = set()  # referência forte até a task terminar
+
+    def em_andamento(self, chave: str):
+        return self._voos.get(chave)
+
+    def iniciar(self, chave: str, cliente: httpx.AsyncClient, image_id: str,
+                tamanho: str = TAMANHO_PADRAO) -> Voo:
+        voo = Voo()
+        self._voos[chave] = voo
+        task = asyncio.create_task(self._baixar(chave, voo, cliente, image_id, tamanho))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return voo
+
+    async def _baixar(self, chave: str, voo: Voo, cliente: httpx.AsyncClient,
+                      image_id: str, tamanho: str):
+        gravacao = None
+        try:
+            async with cliente.stream("GET", url_iiif(image_id, tamanho)) as resp:
+                voo.status = resp.status_code
+                voo.headers = resp.headers
+                if resp.status_code != 200:
+                    voo.falhou = True
+                    return
+                # O temporário existe antes de qualquer leitor acordar
+                gravacao = voo.gravacao = cache_imagens.abrir_gravacao(image_id, tamanho)
+                voo.respondeu.set()
+                async for pedaco in resp.aiter_bytes(CHUNK_BYTES):
+                    gravacao.escrever(pedaco)
+                    voo._avisar()
+            # O despejo LRU pode varrer o diretório — fora do event loop
+            await asyncio.to_thread(gravacao.concluir)
+            gravacao = None
+            transcodificador.agendar(image_id, tamanho)
+        except Exception as e:
+            print(f"⚠️ Falha ao baixar {image_id}: {e}")
+            voo.falhou = True
+        finally:
+            if gravacao is not None:
+                # Download interrompido: não guarda pela metade
+                gravacao.descartar()
+            self._voos.pop(chave, None)
+            voo.terminou = True
+            voo.respondeu.set()
+            voo._avisar()
+
+
+cache_imagens = CacheImagens(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+voos_imagens = VoosEmAndamento()
+
+
+# ──────────────────────────────────────────────
+# FORMATOS MODERNOS (WEBP / AVIF)
+# ──────────────────────────────────────────────
+FORMATOS_DISPONIVEIS = [
+    f for f in IMAGE_FORMATOS if Image is not None and f in QUALIDADE and features.check(f)
+]
+
+
+def negociar_formatos(accept: str) -> list[str]:
+    """
+    Lê o header Accept e devolve os formatos modernos aceitos pelo cliente,
+    na ordem de preferência do servidor. O JPEG é sempre o fallback.
+    """
+    aceitos = set()
+    for parte in (accept or "").split(","):
+        media, _, params = parte.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            nome, _, valor = param.strip().partition("=")
+            if nome == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            aceitos.add(media.strip().lower())
+    return [f for f in FORMATOS_DISPONIVEIS if MEDIA_TYPES[f] in aceitos]
+
+
+class Transcodificador:
+    """
+    Gera as versões WebP/AVIF de uma imagem já em cache, uma única vez,
+    num pool de threads separado (o encoder do Pillow libera o GIL).
+    """
+
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode")
+        self._pendentes = set()
+        self._lock = threading.Lock()
+
+    def agendar(self, image_id: str, tamanho: str = TAMANHO_PADRAO):
+        """Agenda a transcodificação se ainda faltar algum formato no cache."""
+        if not FORMATOS_DISPONIVEIS:
+            return
+        faltando = [
+            f for f in FORMATOS_DISPONIVEIS if not cache_imagens.ja_tentado(image_id, tamanho, f)
+        ]
+        if not faltando:
+            return
+        chave = (image_id, tamanho)
+        with self._lock:
+            if chave in self._pendentes:
+                return
+            self._pendentes.add(chave)
+        self._pool.submit(self._transcodificar, image_id, tamanho, faltando)
+
+    def _transcodificar(self, image_id: str, tamanho: str, formatos: list[str]):
+        try:
+            origem = cache_imagens.obter(image_id, tamanho)
+            if not origem:
+                return
+            with Image.open(origem) as img:
+                if img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                tamanho_jpeg = os.path.getsize(origem)
+                for formato in formatos:
+                    buffer = io.BytesIO()
+                    img.save(buffer, format=formato.upper(), quality=QUALIDADE[formato])
+                    # Se não ficou menor que o JPEG, não vale a pena servir
+                    if buffer.tell() >= tamanho_jpeg:
+                        cache_imagens.marcar_sem_ganho(image_id, tamanho, formato)
+                        continue
+                    gravacao = cache_imagens.abrir_gravacao(image_id, tamanho, formato)
+                    gravacao.escrever(buffer.getvalue())
+                    gravacao.concluir()
+        except Exception as e:
+            print(f"⚠️ Falha ao transcodificar {image_id}: {e}")
+        finally:
+            with self._lock:
+                self._pendentes.discard((image_id, tamanho))
+
+
+transcodificador = Transcodificador(IMAGE_TRANSCODE_WORKERS)
+
+
+# ──────────────────────────────────────────────
+# PRÉ-AQUECIMENTO
+# ──────────────────────────────────────────────
+async def baixar_para_cache(cliente: httpx.AsyncClient, image_id: str,
+                            tamanho: str = TAMANHO_PADRAO) -> bool:
+    """Baixa uma imagem direto para o cache. Retorna True se gravou."""
+    gravacao = cache_imagens.abrir_gravacao(image_id, tamanho)
+    try:
+        async with cliente.stream("GET", url_iiif(image_id, tamanho)) as resp:
+            if resp.status_code != 200:
+                gravacao.descartar()
+                return False
+            async for pedaco in resp.aiter_bytes(CHUNK_BYTES):
+                gravacao.escrever(pedaco)
+    except BaseException:
+        gravacao.descartar()
+        raise
+    await asyncio.to_thread(gravacao.concluir)
+    transcodificador.agendar(image_id, tamanho)
+    return True
+
+
+async def aquecer_cache(image_ids: list[str],
+                        rendicoes: list[str] = IMAGE_PREWARM_RENDICOES,
+                        concorrencia: int = IMAGE_PREWARM_CONCURRENCY) -> int:
+    """
+    Baixa para o cache as imagens (em cada rendition) que ainda não estão lá,
+    no máximo `concorrencia` ao mesmo tempo. Retorna quantos arquivos
+    (pares imagem × rendition) foram gravados.
+    """
+    semaforo = asyncio.Semaphore(concorrencia)
+    tamanhos = [t for t in map(resolver_rendicao, rendicoes) if t]
+
+    async def aquecer(cliente, image_id, tamanho):
+        if cache_imagens.obter(image_id, tamanho):
+            return False
+        async with semaforo:
+            try:
+                return await baixar_para_cache(cliente, image_id, tamanho)
+            except httpx.HTTPError as e:
+                print(f"⚠️ Falha ao aquecer {image_id}: {e}")
+                return False
+
+    async with criar_cliente_iiif() as cliente:
+        resultados = await asyncio.gather(*[
+            aquecer(cliente, image_id, tamanho)
+            for image_id in dict.fromkeys(image_ids)
+            for tamanho in tamanhos
+        ])
+    return sum(resultados)
@@ -4,14 +4,33 @@
 
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Date
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import (
+    create_engine, event, Column, Integer, String, Text, Boolean, Date, DateTime, Float, Index,
+    ForeignKey, Table, func, update, inspect, text, or_, and_, select, exists,
+)
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from sqlalchemy.orm import declarative_base, sessionmaker, Session
-from datetime import date
-from pydantic import BaseModel
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import date, datetime
+from pydantic import BaseModel, TypeAdapter
+from contextlib import asynccontextmanager
+from typing import Optional, Union
 import os
-import requests as http_requests
-import io
+import hashlib
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+from imagens import (
+    cache_imagens, voos_imagens, transcodificador, criar_cliente_iiif,
+    resolver_rendicao, negociar_formatos,
+    RENDICOES, RENDICAO_PADRAO, MEDIA_TYPES,
+)
 
 # ──────────────────────────────────────────────────────────
 # 1. CONFIGURAÇÃO DO BANCO DE DADOS
@@ -23,10 +42,79 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+EH_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool de conexões (valem para o engine síncrono e para o assíncrono).
+# DB_POOL_RECYCLE renova conexões antigas antes que o Postgres/proxy as derrube;
+# DB_POOL_PRE_PING testa a conexão ao tirá-la do pool.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Ajustes do SQLite, aplicados em cada conexão nova: WAL deixa o /feed/hoje
+# ler enquanto a curadoria das 04:00 grava; busy_timeout espera o lock em vez
+# de falhar com "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+
+
+def _opcoes_pool(url: str) -> dict:
+    """Argumentos de pool do create_engine (SQLite em memória usa pool próprio)."""
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _configurar_sqlite(dbapi_connection, connection_record):
+    """Hook de 'connect': PRAGMAs de concorrência do SQLite."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    cursor.close()
+
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **_opcoes_pool(DATABASE_URL))
+if EH_SQLITE:
+    event.listen(engine, "connect", _configurar_sqlite)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Modo assíncrono (DB_ASYNC=1): feed, like, perfil e seed usam AsyncSession
+# (aiosqlite/asyncpg) e não prendem uma thread enquanto esperam o banco.
+# O curador e as tarefas em background continuam no engine síncrono acima.
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+
+def _url_assincrona(url: str) -> str:
+    """sqlite:// → sqlite+aiosqlite://, postgresql:// → postgresql+asyncpg://"""
+    for sincrono, assincrono in (("sqlite://", "sqlite+aiosqlite://"),
+                                 ("postgresql://", "postgresql+asyncpg://")):
+        if url.startswith(sincrono):
+            return url.replace(sincrono, assincrono, 1)
+    return url
+
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(_url_assincrona(DATABASE_URL), **_opcoes_pool(DATABASE_URL))
+    if EH_SQLITE:
+        event.listen(async_engine.sync_engine, "connect", _configurar_sqlite)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+    SessaoBanco = Union[Session, AsyncSession]
+else:
+    SessaoBanco = Session
+
 
 # ──────────────────────────────────────────────────────────
 # 2. MODELOS DO BANCO (AS TABELAS)
@@ -34,38 +122,688 @@ Base = declarative_base()
 class Obra(Base):
     """Uma obra de arte curada pela IA."""
     __tablename__ = "obras"
+    __table_args__ = (
+        # Feed do dia: filtra pela data e lê em ordem de id direto do índice.
+        # Também serve para consultas só por data (prefixo do índice).
+        Index("ix_obras_data_exibicao_id", "data_exibicao", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     titulo = Column(String, nullable=False)
-    imagem_url = Column(String, nullable=False)
+    imagem_url = Column(String, nullable=False, index=True)  # image_id do IIIF
     tags_extraidas = Column(String, default="")  # ex: "impasto, abstrato, azul"
     data_exibicao = Column(Date, default=date.today)
     curtiu = Column(Boolean, default=False)
 
 
+# Decaimento do gosto: um like vale metade depois de GOSTO_MEIA_VIDA_DIAS.
+# Em vez de reescrever a tabela todo dia, cada like entra já multiplicado
+# por 2^((t - época) / meia-vida); o score de hoje é esse acumulado dividido
+# pelo mesmo fator de agora. Ordenar pelo acumulado = ordenar pelo decaído.
+# O fator cresce sem limite: quando passa de 2^GOSTO_EXPOENTE_MAX, a época avança
+# para agora e os scores guardados são reescalados uma vez (ver
+# _rebasear_epoca) — longe do estouro do float (2^1024) com qualquer meia-vida.
+GOSTO_MEIA_VIDA_DIAS = float(os.getenv("GOSTO_MEIA_VIDA_DIAS", "30"))
+if GOSTO_MEIA_VIDA_DIAS <= 0:
+    raise ValueError("GOSTO_MEIA_VIDA_DIAS precisa ser maior que zero")
+GOSTO_EXPOENTE_MAX = 128  # fator máximo antes de rebasear: 2^128
+_EPOCA_GOSTO = datetime(2024, 1, 1)
+# Época em uso; a oficial fica no banco (materializacao.epoca_gosto)
+_epoca_gosto = _EPOCA_GOSTO
+
+
+def _expoente_gosto(quando: datetime) -> float:
+    """Quantas meias-vidas se passaram entre a época e `quando`."""
+    return (quando - _epoca_gosto).total_seconds() / 86400 / GOSTO_MEIA_VIDA_DIAS
+
+
+def fator_gosto(quando: datetime) -> float:
+    """Quanto um like no instante `quando` vale na escala acumulada."""
+    return 2.0 ** _expoente_gosto(quando)
+
+
+def decair(score_acumulado: Optional[float]) -> float:
+    """Score de agora a partir do acumulado (multiplica: nunca estoura, no máximo vira 0)."""
+    return (score_acumulado or 0.0) * 2.0 ** -_expoente_gosto(datetime.utcnow())
+
+
 class PerfilGosto(Base):
     """
     Memória do gosto artístico.
-    Cada tag tem um peso — quanto mais curtida, maior o peso.
+    Cada tag tem um peso (quantas curtidas tem hoje) e um score que decai
+    com o tempo — likes recentes contam mais que os antigos.
     """
     __tablename__ = "perfil_gosto"
 
     id = Column(Integer, primary_key=True, index=True)
     tag = Column(String, unique=True, nullable=False)
     peso = Column(Integer, default=1)
+    score_acumulado = Column(Float, default=0.0)  # na escala de fator_gosto(); lido com decair()
+
+
+# Top-k do /perfil: lê as tags mais fortes direto do índice, já na ordem
+Index("ix_perfil_gosto_score_id", PerfilGosto.score_acumulado.desc(), PerfilGosto.id.desc())
+
+
+class Tag(Base):
+    """Vocabulário de tags (normalizadas: minúsculas, sem espaços nas pontas)."""
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, unique=True, nullable=False)
+
+
+# Quais tags cada obra tem. A chave primária (obra_id, tag_id) indexa
+# obra → tags; o índice invertido (tag_id, obra_id) indexa tag → obras.
+obra_tag = Table(
+    "obra_tag",
+    Base.metadata,
+    Column("obra_id", Integer, ForeignKey("obras.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_obra_tag_tag_id_obra_id", "tag_id", "obra_id"),
+)
+
+
+class EventoLike(Base):
+    """
+    Histórico imutável de likes e unlikes (só recebe INSERT).
+    O perfil_gosto é uma visão materializada deste histórico.
+    """
+    __tablename__ = "eventos_like"
+
+    id = Column(Integer, primary_key=True)
+    obra_id = Column(Integer, ForeignKey("obras.id"), nullable=False, index=True)
+    curtiu = Column(Boolean, nullable=False)  # True = like, False = unlike
+    criado_em = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class EstadoMaterializacao(Base):
+    """Até qual evento cada visão materializada já foi atualizada."""
+    __tablename__ = "materializacao"
+
+    nome = Column(String, primary_key=True)
+    ultimo_evento = Column(Integer, nullable=False, default=0)
+    # Época do fator_gosto em que perfil_gosto.score_acumulado está (NULL = _EPOCA_GOSTO)
+    epoca_gosto = Column(DateTime)
+
+
+class TraducaoObra(Base):
+    """
+    Título e tags em português já gerados pelo GPT para uma obra do ARTIC,
+    para não traduzir de novo obras que voltam nas buscas.
+    """
+    __tablename__ = "traducoes_obras"
+
+    artic_id = Column(Integer, primary_key=True, autoincrement=False)
+    titulo = Column(String, nullable=False)
+    artista = Column(String, nullable=False)
+    tags = Column(String, default="")
+    # Tags do ARTIC (inglês) da obra: ligam as tags do perfil às das candidatas
+    tags_api = Column(String, default="")
+    criado_em = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CacheResposta(Base):
+    """
+    Cache persistente de respostas caras (ex.: completions da OpenAI),
+    por namespace e chave (hash do pedido). Ver cache_persistente.py.
+    """
+    __tablename__ = "cache_respostas"
+    __table_args__ = (
+        Index("ix_cache_respostas_namespace_usado_em", "namespace", "usado_em"),
+    )
+
+    namespace = Column(String, primary_key=True)
+    chave = Column(String(64), primary_key=True)
+    valor = Column(Text, nullable=False)
+    criado_em = Column(DateTime, default=datetime.utcnow, nullable=False)
+    usado_em = Column(DateTime, default=datetime.utcnow, nullable=False)  # relógio do LRU
+    # Validadores HTTP da origem, para revalidar uma entrada vencida (304)
+    etag = Column(String)
+    last_modified = Column(String)
 
 
 # Cria as tabelas fisicamente no banco
 Base.metadata.create_all(bind=engine)
 
 
+def _adicionar_colunas_novas() -> list[str]:
+    """
+    create_all também não acrescenta colunas em tabelas que já existem:
+    adiciona as que o modelo ganhou depois (todas aceitam NULL).
+    """
+    global _epoca_gosto
+    inspetor = inspect(engine)
+    novas = []
+    for tabela in Base.metadata.sorted_tables:
+        existentes = {c["name"] for c in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes:
+                continue
+            tipo = coluna.type.compile(dialect=engine.dialect)
+            try:
+                # Uma transação por coluna: no Postgres um erro aborta a transação inteira
+                with engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {tabela.name} ADD COLUMN {coluna.name} {tipo}"))
+            except (OperationalError, ProgrammingError):
+                # Outro processo subindo ao mesmo tempo adicionou antes (e fez a migração)
+                if coluna.name not in {c["name"] for c in inspect(engine).get_columns(tabela.name)}:
+                    raise
+                continue
+            novas.append(f"{tabela.name}.{coluna.name}")
+    if "perfil_gosto.score_acumulado" in novas:
+        # Perfil de antes do decaimento: conta os pesos como likes de agora
+        agora = datetime.utcnow()
+        with engine.begin() as conn:
+            if _expoente_gosto(agora) > GOSTO_EXPOENTE_MAX:
+                # Época inicial longe demais: começa numa nova (o _iniciar_historico
+                # a grava se a linha de materializacao ainda não existir)
+                _epoca_gosto = agora
+                conn.execute(update(EstadoMaterializacao).values(epoca_gosto=agora))
+            conn.execute(
+                update(PerfilGosto).values(score_acumulado=PerfilGosto.peso * fator_gosto(agora))
+            )
+    return novas
+
+
+_adicionar_colunas_novas()
+
+# create_all não mexe em tabelas que já existem: garante os índices novos
+for _tabela in Base.metadata.sorted_tables:
+    for _indice in _tabela.indexes:
+        _indice.create(bind=engine, checkfirst=True)
+
+
+def normalizar_tags(tags: str) -> list[str]:
+    """'Impasto, Abstrato , ' → ['impasto', 'abstrato'] (sem vazias nem repetidas)."""
+    return list(dict.fromkeys(
+        t.strip().lower() for t in (tags or "").split(",") if t.strip()
+    ))
+
+
+def _garantir_tags(db: Session, nomes: list[str]) -> list[int]:
+    """Cria no vocabulário as tags que faltam e devolve os ids de todas."""
+    dialeto = db.get_bind().dialect.name
+    if dialeto in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialeto == "sqlite" else postgresql.insert
+        db.execute(
+            insert(Tag).values([{"nome": n} for n in nomes])
+            .on_conflict_do_nothing(index_elements=[Tag.nome])
+        )
+    else:
+        existentes = {n for (n,) in db.query(Tag.nome).filter(Tag.nome.in_(nomes))}
+        db.add_all([Tag(nome=n) for n in nomes if n not in existentes])
+        db.flush()
+    return [i for (i,) in db.query(Tag.id).filter(Tag.nome.in_(nomes))]
+
+
+def vincular_tags(db: Session, obra: Obra, tags: str) -> list[str]:
+    """
+    Liga a obra às suas tags na tabela obra_tag (a string tags_extraidas
+    continua igual, é o que o iPhone recebe). Devolve as tags normalizadas.
+    """
+    nomes = normalizar_tags(tags)
+    if not nomes:
+        return []
+    db.flush()  # garante obra.id
+    db.execute(
+        obra_tag.insert(),
+        [{"obra_id": obra.id, "tag_id": tag_id} for tag_id in _garantir_tags(db, nomes)],
+    )
+    return nomes
+
+
+def incrementar_tags(db: Session, deltas: dict[str, tuple[int, float]]):
+    """
+    Soma a cada tag do perfil o seu delta (peso, score acumulado), criando
+    as que não existem.
+    SQLite e Postgres: um único INSERT ... ON CONFLICT DO UPDATE (sem corrida
+    quando dois likes criam a mesma tag). Outros bancos: uma busca em lote.
+    """
+    if not deltas:
+        return
+
+    dialeto = db.get_bind().dialect.name
+    if dialeto in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialeto == "sqlite" else postgresql.insert
+        stmt = insert(PerfilGosto).values([
+            {"tag": tag, "peso": peso, "score_acumulado": score}
+            for tag, (peso, score) in deltas.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PerfilGosto.tag],
+            set_={
+                "peso": PerfilGosto.peso + stmt.excluded.peso,
+                "score_acumulado": PerfilGosto.score_acumulado + stmt.excluded.score_acumulado,
+            },
+        )
+        db.execute(stmt)
+        return
+
+    existentes = {
+        p.tag: p for p in db.query(PerfilGosto).filter(PerfilGosto.tag.in_(list(deltas)))
+    }
+    for tag, (peso, score) in deltas.items():
+        perfil = existentes.get(tag)
+        if perfil is None:
+            perfil = PerfilGosto(tag=tag, peso=0, score_acumulado=0.0)
+            db.add(perfil)
+        perfil.peso += peso
+        perfil.score_acumulado += score
+
+
+def _tags_das_obras(db: Session, obra_ids: list[int]) -> dict[int, list[str]]:
+    """
+    Tags de várias obras numa consulta só. Obras antigas são ligadas na
+    subida (_vincular_obras_antigas); a ligação aqui cobre alguma que
+    outro processo tenha gravado sem passar por vincular_tags.
+    """
+    tags = {obra_id: [] for obra_id in obra_ids}
+    linhas = (
+        db.query(obra_tag.c.obra_id, Tag.nome)
+        .join(Tag, Tag.id == obra_tag.c.tag_id)
+        .filter(obra_tag.c.obra_id.in_(obra_ids))
+    )
+    for obra_id, nome in linhas:
+        tags[obra_id].append(nome)
+    sem_vinculo = [obra_id for obra_id, nomes in tags.items() if not nomes]
+    if sem_vinculo:
+        for obra in db.query(Obra).filter(Obra.id.in_(sem_vinculo), Obra.tags_extraidas != ""):
+            tags[obra.id] = vincular_tags(db, obra, obra.tags_extraidas)
+    return tags
+
+
+# ──────────────────────────────────────────────────────────
+# MATERIALIZAÇÃO DO PERFIL A PARTIR DOS EVENTOS DE LIKE
+# ──────────────────────────────────────────────────────────
+VISAO_PERFIL = "perfil_gosto"
+LOTE_EVENTOS = int(os.getenv("LOTE_EVENTOS", "1000"))
+_lock_materializacao = threading.Lock()
+
+
+# Páginas do /perfil guardadas na memória: (limite, cursor) → (versão, hora, linhas).
+# Escritas deste processo invalidam na hora; o TTL cobre as de outros
+# processos (ex.: reconstruir_perfil.py rodando à parte).
+PERFIL_CACHE_TTL = float(os.getenv("PERFIL_CACHE_TTL", "60"))
+_versao_perfil = 0
+_cache_perfil: dict[tuple[int, Optional[str]], tuple[int, float, list]] = {}
+
+
+def invalidar_perfil():
+    """Avisa que o perfil_gosto mudou — chamar DEPOIS do commit."""
+    global _versao_perfil
+    _versao_perfil += 1
+    _cache_perfil.clear()
+
+
+def pagina_do_perfil(db: Session, limite: int, cursor: Optional[str]):
+    """
+    Uma página do perfil em ordem de score (keyset: score, id), usando o
+    índice ix_perfil_gosto_score_id. Devolve (linhas, cursor da próxima).
+    O cursor é "época:score:id"; ValueError se malformado ou de outra época.
+    Cada linha é (tag, peso, score de agora), já com o decaimento, na época
+    que está no banco.
+    """
+    chave = (limite, cursor)
+    guardado = _cache_perfil.get(chave)
+    if guardado and guardado[0] == _versao_perfil and time.monotonic() - guardado[1] < PERFIL_CACHE_TTL:
+        return guardado[2]
+
+    versao = _versao_perfil
+    epoca = _sincronizar_epoca(db.get(EstadoMaterializacao, VISAO_PERFIL))
+    # O score do cursor está na escala da época: de outra época não vale mais
+    marca_epoca = f"{epoca:%Y%m%d%H%M%S%f}" if epoca else "0"
+    consulta = db.query(PerfilGosto.tag, PerfilGosto.peso, PerfilGosto.score_acumulado, PerfilGosto.id)
+    if cursor:
+        epoca_cursor, score, ultimo_id = cursor.split(":")
+        score, ultimo_id = float(score), int(ultimo_id)
+        if epoca_cursor != marca_epoca or not math.isfinite(score):
+            raise ValueError("cursor de outra época ou com score inválido")
+        consulta = consulta.filter(or_(
+            PerfilGosto.score_acumulado < score,
+            and_(PerfilGosto.score_acumulado == score, PerfilGosto.id < ultimo_id),
+        ))
+    linhas = (
+        consulta.order_by(PerfilGosto.score_acumulado.desc(), PerfilGosto.id.desc())
+        .limit(limite + 1)
+        .all()
+    )
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = f"{marca_epoca}:{linhas[-1].score_acumulado!r}:{linhas[-1].id}"
+    pagina = ([(l.tag, l.peso, decair(l.score_acumulado)) for l in linhas], proximo)
+
+    if versao == _versao_perfil:
+        if len(_cache_perfil) > 256:
+            _cache_perfil.clear()
+        _cache_perfil[chave] = (versao, time.monotonic(), pagina)
+    return pagina
+
+
+def _ultimos_likes(db: Session, obra_ids: list[int], antes_de: int) -> dict[int, datetime]:
+    """Quando foi o último like de cada obra, olhando só eventos anteriores."""
+    return dict(
+        db.query(EventoLike.obra_id, func.max(EventoLike.criado_em))
+        .filter(EventoLike.obra_id.in_(obra_ids), EventoLike.curtiu.is_(True),
+                EventoLike.id < antes_de)
+        .group_by(EventoLike.obra_id)
+        .all()
+    )
+
+
+def _aplicar_lote(db: Session, eventos: list) -> None:
+    """
+    Converte um lote de eventos em deltas por tag e aplica no perfil.
+    Like soma 1 ao peso e fator_gosto(hora do like) ao score; unlike
+    desfaz exatamente o que o like correspondente tinha somado.
+    """
+    tags = _tags_das_obras(db, list({e.obra_id for e in eventos}))
+    descurtidas = list({e.obra_id for e in eventos if not e.curtiu})
+    ultimo_like = _ultimos_likes(db, descurtidas, eventos[0].id) if descurtidas else {}
+
+    pesos, scores = Counter(), Counter()
+    for evento in eventos:
+        if evento.curtiu:
+            ultimo_like[evento.obra_id] = evento.criado_em
+            sinal, fator = 1, fator_gosto(evento.criado_em)
+        else:
+            quando = ultimo_like.pop(evento.obra_id, evento.criado_em)
+            sinal, fator = -1, fator_gosto(quando)
+        for tag in tags[evento.obra_id]:
+            pesos[tag] += sinal
+            scores[tag] += sinal * fator
+
+    deltas = {tag: (pesos[tag], scores[tag]) for tag in pesos if pesos[tag] or scores[tag]}
+    incrementar_tags(db, deltas)
+    if any(peso < 0 for peso, _ in deltas.values()):
+        db.query(PerfilGosto).filter(PerfilGosto.peso <= 0).delete(synchronize_session=False)
+
+
+def _sincronizar_epoca(estado: Optional[EstadoMaterializacao]) -> Optional[datetime]:
+    """Adota a época gravada no banco (outro processo pode ter rebaseado)."""
+    global _epoca_gosto
+    epoca = estado.epoca_gosto if estado else None
+    _epoca_gosto = epoca or _EPOCA_GOSTO
+    return epoca
+
+
+def _mesma_epoca(epoca: Optional[datetime]):
+    """Condição SQL: a época no banco ainda é `epoca` (NULL = a inicial)."""
+    if epoca is None:
+        return EstadoMaterializacao.epoca_gosto.is_(None)
+    return EstadoMaterializacao.epoca_gosto == epoca
+
+
+def _rebasear_epoca(db: Session, epoca: Optional[datetime]) -> bool:
+    """
+    Se o fator de agora passou de 2^GOSTO_EXPOENTE_MAX, move a época para agora e
+    divide todos os scores acumulados pelo fator da nova época (a ordem e o
+    score decaído não mudam). Compare-and-set na época: só um processo faz.
+    """
+    agora = datetime.utcnow()
+    expoente = _expoente_gosto(agora)
+    if expoente <= GOSTO_EXPOENTE_MAX:
+        return False
+    mudou = db.execute(
+        update(EstadoMaterializacao)
+        .where(EstadoMaterializacao.nome == VISAO_PERFIL, _mesma_epoca(epoca))
+        .values(epoca_gosto=agora)
+    ).rowcount
+    if not mudou:
+        db.rollback()
+        return False
+    db.execute(update(PerfilGosto).values(
+        score_acumulado=PerfilGosto.score_acumulado * 2.0 ** -expoente
+    ))
+    db.commit()
+    _sincronizar_epoca(db.get(EstadoMaterializacao, VISAO_PERFIL))
+    invalidar_perfil()
+    print(f"⏳ Época do gosto avançada para {agora:%Y-%m-%d} (scores reescalados)")
+    return True
+
+
+def materializar_perfil(db: Session, tamanho_lote: int = LOTE_EVENTOS) -> int:
+    """
+    Aplica no perfil_gosto os eventos de like ainda não processados, em
+    lotes de `tamanho_lote` (uma transação por lote, memória limitada).
+    O cursor avança com compare-and-set junto com os deltas: se outro
+    processo aplicou o mesmo lote antes (ou mudou a época do fator), este
+    desiste — cada evento conta exatamente uma vez, na escala certa.
+    Retorna quantos eventos foram aplicados.
+    """
+    aplicados = 0
+    with _lock_materializacao:
+        while True:
+            estado = db.get(EstadoMaterializacao, VISAO_PERFIL)
+            epoca = _sincronizar_epoca(estado)
+            if _rebasear_epoca(db, epoca):
+                continue
+            cursor = estado.ultimo_evento
+            eventos = (
+                db.query(EventoLike)
+                .filter(EventoLike.id > cursor)
+                .order_by(EventoLike.id)
+                .limit(tamanho_lote)
+                .all()
+            )
+            if not eventos:
+                db.rollback()
+                return aplicados
+
+            _aplicar_lote(db, eventos)
+            avancou = db.execute(
+                update(EstadoMaterializacao)
+                .where(EstadoMaterializacao.nome == VISAO_PERFIL,
+                       EstadoMaterializacao.ultimo_evento == cursor,
+                       _mesma_epoca(epoca))
+                .values(ultimo_evento=eventos[-1].id)
+            ).rowcount
+            if not avancou:
+                db.rollback()
+                return aplicados
+            db.commit()
+            invalidar_perfil()
+            aplicados += len(eventos)
+            if len(eventos) < tamanho_lote:
+                # Lote incompleto: o log acabou, não precisa de outra volta
+                return aplicados
+
+
+def reconstruir_perfil(db: Session, tamanho_lote: int = LOTE_EVENTOS) -> int:
+    """Apaga o perfil e refaz tudo a partir do histórico de eventos."""
+    with _lock_materializacao:
+        db.query(PerfilGosto).delete(synchronize_session=False)
+        db.query(EstadoMaterializacao).filter(
+            EstadoMaterializacao.nome == VISAO_PERFIL
+        ).update({"ultimo_evento": 0})
+        db.commit()
+        invalidar_perfil()
+    return materializar_perfil(db, tamanho_lote)
+
+
+def _iniciar_historico():
+    """
+    Na primeira subida com a tabela de eventos, registra os likes atuais como
+    eventos já materializados (o perfil existente já os conta). Assim uma
+    reconstrução depois parte do estado real das obras curtidas.
+    """
+    db = SessionLocal()
+    try:
+        if db.get(EstadoMaterializacao, VISAO_PERFIL):
+            return
+        curtidas = [obra_id for (obra_id,) in db.query(Obra.id).filter(Obra.curtiu.is_(True))]
+        db.add_all([EventoLike(obra_id=obra_id, curtiu=True) for obra_id in curtidas])
+        db.flush()
+        ultimo = db.query(func.max(EventoLike.id)).scalar() or 0
+        db.add(EstadoMaterializacao(
+            nome=VISAO_PERFIL, ultimo_evento=ultimo,
+            epoca_gosto=_epoca_gosto if _epoca_gosto != _EPOCA_GOSTO else None,
+        ))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # outro processo fez ao mesmo tempo
+    finally:
+        db.close()
+
+
+_iniciar_historico()
+
+
+def _carregar_epoca():
+    """
+    Lê na subida a época do fator de gosto gravada no banco e, se o servidor
+    ficou parado tempo demais, já a avança (antes de qualquer like).
+    """
+    db = SessionLocal()
+    try:
+        with _lock_materializacao:
+            _rebasear_epoca(db, _sincronizar_epoca(db.get(EstadoMaterializacao, VISAO_PERFIL)))
+    finally:
+        db.close()
+
+
+_carregar_epoca()
+
+
+def _vincular_obras_antigas(tamanho_lote: int = 500) -> int:
+    """
+    Liga às suas tags (obra_tag) as obras gravadas antes da tabela existir,
+    para o /tags/{tag}/obras enxergá-las. Depois da primeira vez a consulta
+    (índice de obra_tag) quase não acha nada. Devolve quantas obras ligou.
+    """
+    total, ultimo_id = 0, 0
+    db = SessionLocal()
+    try:
+        while True:
+            ids = [
+                obra_id for (obra_id,) in db.execute(
+                    select(Obra.id)
+                    .where(
+                        Obra.id > ultimo_id,
+                        Obra.tags_extraidas != "",
+                        ~exists().where(obra_tag.c.obra_id == Obra.id),
+                    )
+                    .order_by(Obra.id)
+                    .limit(tamanho_lote)
+                )
+            ]
+            if not ids:
+                break
+            for obra in db.query(Obra).filter(Obra.id.in_(ids)):
+                # Tags só com vírgulas/espaços não ligam nada (e são revistas na próxima subida)
+                if vincular_tags(db, obra, obra.tags_extraidas):
+                    total += 1
+            db.commit()
+            ultimo_id = ids[-1]
+    except IntegrityError:
+        db.rollback()  # outro processo ligando ao mesmo tempo
+    finally:
+        db.close()
+    if total:
+        print(f"🏷️ {total} obras antigas ligadas às suas tags")
+    return total
+
+
+_vincular_obras_antigas()
+
+
+# Modo write-behind: o like só grava o evento; uma thread materializa o
+# perfil em lote (a cada LIKES_FLUSH_MS ou LIKES_FLUSH_EVENTOS likes)
+LIKES_WRITE_BEHIND = os.getenv("LIKES_WRITE_BEHIND", "0") == "1"
+LIKES_FLUSH_MS = int(os.getenv("LIKES_FLUSH_MS", "500"))
+LIKES_FLUSH_EVENTOS = int(os.getenv("LIKES_FLUSH_EVENTOS", "100"))
+
+
+class MaterializadorEmSegundoPlano:
+    """
+    Thread que mantém o perfil_gosto em dia com os eventos de like.
+    Os eventos já estão no banco, então nada se perde se o processo cair:
+    a próxima subida continua do cursor.
+    """
+
+    def __init__(self):
+        self._avisos = queue.Queue()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def avisar(self):
+        """Um like novo foi gravado."""
+        self._avisos.put(None)
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join()
+        self.materializar()
+
+    def _loop(self):
+        self.materializar()  # o que ficou da última execução
+        while not self._parar.is_set():
+            if self._esperar():
+                self.materializar()
+
+    def _esperar(self) -> int:
+        """Espera até LIKES_FLUSH_MS ou até juntar LIKES_FLUSH_EVENTOS avisos."""
+        avisos = 0
+        limite = time.monotonic() + LIKES_FLUSH_MS / 1000
+        while avisos < LIKES_FLUSH_EVENTOS:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                self._avisos.get(timeout=restante)
+                avisos += 1
+            except queue.Empty:
+                break
+        return avisos
+
+    def materializar(self):
+        """Roda a materialização agora, numa sessão própria."""
+        db = SessionLocal()
+        try:
+            materializar_perfil(db)
+        except Exception as e:
+            print(f"❌ Erro ao materializar perfil de gosto: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+
+materializador = MaterializadorEmSegundoPlano()
+
+
 # ──────────────────────────────────────────────────────────
 # 3. SERVIDOR FASTAPI
 # ──────────────────────────────────────────────────────────
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    """
+    Abre o cliente HTTP do IIIF na subida e fecha no desligamento.
+    No modo write-behind, também liga e para o materializador do perfil.
+    """
+    app.state.cliente_iiif = criar_cliente_iiif()
+    if LIKES_WRITE_BEHIND:
+        materializador.iniciar()
+    try:
+        yield
+    finally:
+        await app.state.cliente_iiif.aclose()
+        if LIKES_WRITE_BEHIND:
+            await run_in_threadpool(materializador.parar)
+        if DB_ASYNC:
+            await async_engine.dispose()
+
+
 app = FastAPI(
     title="ArtAdvisor API",
     description="Curadoria de arte personalizada com IA 🎨",
     version="1.0.0",
+    lifespan=ciclo_de_vida,
 )
 
 # Permite o iPhone se conectar (CORS aberto para dev)
@@ -87,6 +825,126 @@ def get_db():
         db.close()
 
 
+async def get_sessao():
+    """
+    Dependency das rotas assíncronas: AsyncSession no modo DB_ASYNC,
+    senão a Session de sempre (usada numa thread por rodar_no_banco).
+    """
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as sessao:
+            yield sessao
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()  # a conexão já foi devolvida em _rodar_e_liberar
+
+
+def _rodar_e_liberar(db: Session, funcao, *args):
+    # Devolve a conexão ao pool assim que o trabalho termina (e ainda na
+    # thread): segurá-la até o fim da resposta esgota o pool sob carga
+    try:
+        return funcao(db, *args)
+    finally:
+        db.close()
+
+
+async def rodar_no_banco(db: SessaoBanco, funcao, *args):
+    """
+    Roda código ORM escrito para Session na sessão da requisição:
+    no modo DB_ASYNC via AsyncSession.run_sync (sem thread), senão no threadpool.
+    """
+    if DB_ASYNC:
+        return await db.run_sync(funcao, *args)
+    return await run_in_threadpool(_rodar_e_liberar, db, funcao, *args)
+
+
+def etag_confere(if_none_match: str, etag: str) -> bool:
+    """Confere o header If-None-Match contra o ETag atual (aceita lista e *)."""
+    if not if_none_match:
+        return False
+    candidatos = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
+
+
+# Versão do feed: muda a cada curadoria, seed ou like. Vive na memória do
+# processo (o agendador roda aqui dentro); o nonce evita que um reinício
+# reaproveite ETags antigos. Com vários workers, cada um tem sua versão.
+# Escritas de fora do processo (python curador.py, outro worker) são vistas
+# pela marca do feed no banco, conferida no máximo a cada FEED_VERIFICAR_S.
+FEED_VERIFICAR_S = float(os.getenv("FEED_VERIFICAR_S", "30"))
+_NONCE_PROCESSO = uuid.uuid4().hex
+_versao_feed = 0
+_lock_feed = threading.Lock()
+
+# JSON do feed já serializado: (data, base_url) → (versão, corpo em bytes)
+_cache_feed: dict[tuple[date, str], tuple[int, bytes]] = {}
+
+
+# Última marca do feed vista no banco e quando foi conferida
+_marca_feed = None
+_marca_feed_em = float("-inf")
+
+
+def _marca_feed_no_banco(db: Session, hoje: date) -> tuple:
+    """(dia, quantas obras, maior id) do feed — só lê o índice (data_exibicao, id)."""
+    quantidade, maior_id = (
+        db.query(func.count(Obra.id), func.max(Obra.id))
+        .filter(Obra.data_exibicao == hoje)
+        .one()
+    )
+    return hoje, quantidade, maior_id
+
+
+async def conferir_feed_no_banco(db: SessaoBanco, hoje: date):
+    """
+    Invalida o feed se as obras de hoje mudaram no banco por fora deste
+    processo. Vai ao banco no máximo uma vez a cada FEED_VERIFICAR_S.
+    """
+    global _marca_feed, _marca_feed_em
+    if time.monotonic() - _marca_feed_em < FEED_VERIFICAR_S:
+        return
+    _marca_feed_em = time.monotonic()
+    marca = await rodar_no_banco(db, _marca_feed_no_banco, hoje)
+    if _marca_feed is not None and marca != _marca_feed:
+        invalidar_feed()
+    _marca_feed = marca
+
+
+def invalidar_feed():
+    """Avisa que o feed mudou — chamar DEPOIS do commit."""
+    global _versao_feed
+    with _lock_feed:
+        _versao_feed += 1
+        _cache_feed.clear()
+
+
+def etag_feed(base: str, hoje: date, versao: int) -> str:
+    """ETag do feed de um dia, calculado sem tocar no banco."""
+    chave = f"{hoje}|{base}|{_NONCE_PROCESSO}|{versao}"
+    return f'"{hashlib.sha256(chave.encode()).hexdigest()[:32]}"'
+
+
+def feed_em_cache(hoje: date, base: str, versao: int):
+    """Corpo JSON guardado para esta versão do feed, ou None."""
+    guardado = _cache_feed.get((hoje, base))
+    if guardado and guardado[0] == versao:
+        return guardado[1]
+    return None
+
+
+def guardar_feed(hoje: date, base: str, versao: int, corpo: bytes):
+    """Guarda o corpo — só se nenhuma escrita aconteceu durante a consulta."""
+    with _lock_feed:
+        if versao != _versao_feed:
+            return
+        # Descarta dias anteriores: o dict fica com um dia só
+        for chave in [c for c in _cache_feed if c[0] != hoje]:
+            del _cache_feed[chave]
+        _cache_feed[(hoje, base)] = (versao, corpo)
+
+
 # ──────────────────────────────────────────────────────────
 # 4. SCHEMAS DE RESPOSTA (Pydantic)
 # ──────────────────────────────────────────────────────────
@@ -94,6 +952,7 @@ class ObraResponse(BaseModel):
     id: int
     titulo: str
     imagem_url: str
+    imagens: dict[str, str] = {}  # rendition → URL (thumb, card, full)
     tags_extraidas: str
     curtiu: bool
 
@@ -101,6 +960,9 @@ class ObraResponse(BaseModel):
         from_attributes = True
 
 
+_serializador_feed = TypeAdapter(list[ObraResponse])
+
+
 class LikeResponse(BaseModel):
     status: str
     curtiu: bool
@@ -109,6 +971,7 @@ class LikeResponse(BaseModel):
 class PerfilResponse(BaseModel):
     tag: str
     peso: int
+    score: float  # peso com decaimento no tempo
 
     class Config:
         from_attributes = True
@@ -125,91 +988,177 @@ def raiz():
 
 
 @app.get("/feed/hoje", response_model=list[ObraResponse])
-def obter_feed_do_dia(request: Request, db: Session = Depends(get_db)):
+async def obter_feed_do_dia(request: Request, db: SessaoBanco = Depends(get_sessao)):
     """
     O iPhone chama esta rota ao abrir o app.
     Retorna todas as obras curadas para hoje.
     As imagens são servidas via proxy pela nossa API.
+    O JSON fica em cache na memória; com o ETag do app (If-None-Match), responde 304.
     """
-    obras = db.query(Obra).filter(Obra.data_exibicao == date.today()).all()
     base = str(request.base_url).rstrip("/")
+    hoje = date.today()
+    await conferir_feed_no_banco(db, hoje)
+    # Versão lida ANTES da consulta: uma escrita no meio só pode invalidá-la
+    versao = _versao_feed
+    etag = etag_feed(base, hoje, versao)
+    headers_cache = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_confere(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers_cache)
+
+    corpo = feed_em_cache(hoje, base, versao)
+    if corpo is None:
+        obras = await rodar_no_banco(db, _montar_feed, base, hoje)
+        corpo = _serializador_feed.dump_json(obras)
+        guardar_feed(hoje, base, versao, corpo)
+    return Response(corpo, media_type="application/json", headers=headers_cache)
+
+
+def _montar_feed(db: Session, base: str, hoje: date) -> list[ObraResponse]:
+    """Consulta as obras do dia e monta a resposta do feed."""
+    obras = db.query(Obra).filter(Obra.data_exibicao == hoje).order_by(Obra.id).all()
+    return [_obra_response(obra, base) for obra in obras]
 
-    resultado = []
-    for obra in obras:
-        resultado.append(ObraResponse(
-            id=obra.id,
-            titulo=obra.titulo,
-            imagem_url=f"{base}/imagem/{obra.imagem_url}",
-            tags_extraidas=obra.tags_extraidas,
-            curtiu=obra.curtiu,
-        ))
-    return resultado
+
+def _obra_response(obra: Obra, base: str) -> ObraResponse:
+    """Converte a obra do banco no formato que o iPhone espera."""
+    url_imagem = f"{base}/imagem/{obra.imagem_url}"
+    return ObraResponse(
+        id=obra.id,
+        titulo=obra.titulo,
+        imagem_url=url_imagem,
+        imagens={nome: f"{url_imagem}?tamanho={nome}" for nome in RENDICOES},
+        tags_extraidas=obra.tags_extraidas,
+        curtiu=obra.curtiu,
+    )
 
 
 @app.post("/obra/{obra_id}/like", response_model=LikeResponse)
-def dar_like(obra_id: int, db: Session = Depends(get_db)):
+async def dar_like(obra_id: int, db: SessaoBanco = Depends(get_sessao)):
     """
     O iPhone avisa do ❤️ e a IA aprende!
     Toggle: se já curtiu, descurte. Se não curtiu, curte.
-    Ao curtir, aumenta o peso das tags associadas à obra.
+    Cada toque vira um evento no histórico; o perfil de gosto é atualizado a
+    partir dele (like soma, unlike desfaz). Com LIKES_WRITE_BEHIND=1 essa
+    atualização fica para a thread de materialização, em lote.
     """
-    obra = db.query(Obra).filter(Obra.id == obra_id).first()
-    if not obra:
+    curtiu = await rodar_no_banco(db, _alternar_like, obra_id)
+    if curtiu is None:
         raise HTTPException(status_code=404, detail="Obra não encontrada")
+    invalidar_feed()
 
-    # Toggle do like
-    obra.curtiu = not obra.curtiu
+    # APRENDIZADO: o perfil de gosto acompanha o histórico de eventos
+    if LIKES_WRITE_BEHIND:
+        materializador.avisar()
+    else:
+        await run_in_threadpool(materializador.materializar)
+    return LikeResponse(status="sucesso", curtiu=curtiu)
 
-    # APRENDIZADO: aumenta o peso das tags quando curte
-    if obra.curtiu and obra.tags_extraidas:
-        tags = [t.strip().lower() for t in obra.tags_extraidas.split(",")]
-        for tag_nome in tags:
-            if not tag_nome:
-                continue
-            perfil = db.query(PerfilGosto).filter(PerfilGosto.tag == tag_nome).first()
-            if perfil:
-                perfil.peso += 1
-            else:
-                db.add(PerfilGosto(tag=tag_nome, peso=1))
 
+def _alternar_like(db: Session, obra_id: int) -> Optional[bool]:
+    """Toggle do like + evento no histórico, na mesma transação."""
+    obra = db.query(Obra).filter(Obra.id == obra_id).first()
+    if not obra:
+        return None
+
+    obra.curtiu = not obra.curtiu
+    curtiu = obra.curtiu
+    db.add(EventoLike(obra_id=obra.id, curtiu=curtiu))
     db.commit()
-    db.refresh(obra)
-    return LikeResponse(status="sucesso", curtiu=obra.curtiu)
+    return curtiu
 
 
 @app.get("/perfil", response_model=list[PerfilResponse])
-def ver_perfil_gosto(db: Session = Depends(get_db)):
-    """Rota auxiliar: mostra o perfil de gosto aprendido."""
-    return db.query(PerfilGosto).order_by(PerfilGosto.peso.desc()).all()
+async def ver_perfil_gosto(response: Response, limite: int = 50, cursor: Optional[str] = None,
+                           db: SessaoBanco = Depends(get_sessao)):
+    """
+    Rota auxiliar: mostra o perfil de gosto aprendido (mais forte hoje primeiro).
+    Paginado: se houver mais tags, o header X-Proximo-Cursor traz o valor
+    a passar em `cursor` para buscar a página seguinte.
+    """
+    limite = max(1, min(limite, 500))
+    try:
+        linhas, proximo = await rodar_no_banco(db, pagina_do_perfil, limite, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if proximo:
+        response.headers["X-Proximo-Cursor"] = proximo
+
+    return [PerfilResponse(tag=tag, peso=peso, score=score) for tag, peso, score in linhas]
+
+
+@app.get("/tags/{tag}/obras", response_model=list[ObraResponse])
+def obras_com_tag(tag: str, request: Request, limite: int = 50,
+                  db: Session = Depends(get_db)):
+    """Obras com uma tag, das mais recentes para as mais antigas (via obra_tag)."""
+    obras = (
+        db.query(Obra)
+        .join(obra_tag, obra_tag.c.obra_id == Obra.id)
+        .join(Tag, Tag.id == obra_tag.c.tag_id)
+        .filter(Tag.nome == tag.strip().lower())
+        .order_by(Obra.id.desc())
+        .limit(min(limite, 200))
+        .all()
+    )
+    base = str(request.base_url).rstrip("/")
+    return [_obra_response(obra, base) for obra in obras]
 
 
 @app.get("/imagem/{image_id}")
-def proxy_imagem(image_id: str):
+async def proxy_imagem(image_id: str, request: Request, tamanho: str = RENDICAO_PADRAO):
     """
     Proxy de imagens do Art Institute of Chicago.
     Busca a imagem via IIIF e retransmite para o iPhone.
     Isso contorna o bloqueio de 403 que o IIIF faz em clientes diretos.
+    A imagem fica em cache no disco (ver imagens.py); com o ETag, responde 304.
     """
-    iiif_url = f"https://www.artic.edu/iiif/2/{image_id}/full/843,/0/default.jpg"
-
-    resp = http_requests.get(
-        iiif_url,
-        headers={
-            "User-Agent": "ArtAdvisor/1.0 (Educational Project)",
-            "Referer": "https://www.artic.edu/",
-            "Accept": "image/jpeg,image/*",
-        },
-        stream=True,
-        timeout=15,
-    )
+    spec = resolver_rendicao(tamanho)
+    if spec is None:
+        raise HTTPException(status_code=400, detail="Tamanho de imagem inválido")
+
+    headers_cache = {"Cache-Control": "public, max-age=86400", "Vary": "Accept"}
+    formatos = negociar_formatos(request.headers.get("accept", ""))
+    chave = cache_imagens.caminho(image_id, spec)
 
-    if resp.status_code != 200:
+    async def servir_do_cache(caminho: str, formato: str):
+        try:
+            etag = await run_in_threadpool(cache_imagens.etag, caminho)
+        except FileNotFoundError:
+            return None  # despejado entre o obter() e agora
+        headers = {**headers_cache, "ETag": etag}
+        if etag_confere(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(caminho, media_type=MEDIA_TYPES[formato], headers=headers)
+
+    for formato in formatos:
+        caminho = cache_imagens.obter(image_id, spec, formato)
+        resposta = caminho and await servir_do_cache(caminho, formato)
+        if resposta:
+            return resposta
+
+    caminho = cache_imagens.obter(image_id, spec)
+    resposta = caminho and await servir_do_cache(caminho, "jpg")
+    if resposta:
+        if formatos:
+            transcodificador.agendar(image_id, spec)
+        return resposta
+
+    # Fora do cache: entra no download em andamento ou abre um. O download
+    # roda numa task própria e grava no cache mesmo se este cliente sumir.
+    voo = voos_imagens.em_andamento(chave) or voos_imagens.iniciar(
+        chave, app.state.cliente_iiif, image_id, spec
+    )
+    await voo.respondeu.wait()
+    if voo.status != 200 or voo.gravacao is None:
         raise HTTPException(status_code=502, detail="Imagem indisponível")
 
+    # aiter_bytes descomprime; só repassa o tamanho se vier sem Content-Encoding
+    if "Content-Length" in voo.headers and "Content-Encoding" not in voo.headers:
+        headers_cache["Content-Length"] = voo.headers["Content-Length"]
+
     return StreamingResponse(
-        io.BytesIO(resp.content),
-        media_type=resp.headers.get("Content-Type", "image/jpeg"),
-        headers={"Cache-Control": "public, max-age=86400"},
+        voo.ler(),
+        media_type=voo.headers.get("Content-Type", "image/jpeg"),
+        headers=headers_cache,
     )
 
 
@@ -220,8 +1169,15 @@ class SeedRequest(BaseModel):
 
 
 @app.post("/admin/seed")
-def seed_obra(payload: SeedRequest, db: Session = Depends(get_db)):
+async def seed_obra(payload: SeedRequest, db: SessaoBanco = Depends(get_sessao)):
     """Insere uma obra manualmente (para testes/seed)."""
+    nova_id = await rodar_no_banco(db, _inserir_obra, payload)
+    invalidar_feed()
+    return {"status": "ok", "id": nova_id}
+
+
+def _inserir_obra(db: Session, payload: SeedRequest) -> int:
+    """Grava a obra do seed com suas tags e devolve o id."""
     nova = Obra(
         titulo=payload.titulo,
         imagem_url=payload.imagem_url,
@@ -229,17 +1185,24 @@ def seed_obra(payload: SeedRequest, db: Session = Depends(get_db)):
         data_exibicao=date.today(),
     )
     db.add(nova)
+    vincular_tags(db, nova, payload.tags_extraidas)
     db.commit()
-    db.refresh(nova)
-    return {"status": "ok", "id": nova.id}
+    return nova.id
+
+
+@app.get("/admin/pool")
+def status_pool():
+    """Ocupação do(s) pool(s) de conexões, para monitorar saturação."""
+    status = {"sincrono": engine.pool.status()}
+    if DB_ASYNC:
+        status["assincrono"] = async_engine.pool.status()
+    return status
 
 
 # ──────────────────────────────────────────────────────────
 # 6. AGENDADOR — CURADORIA AUTOMÁTICA ÀS 04:00 AM
 # ──────────────────────────────────────────────────────────
 import schedule
-import threading
-import time
 
 
 def _rodar_curadoria_segura():
@@ -0,0 +1,126 @@
+# ranqueador.py — Ordena as candidatas pelo perfil de gosto inteiro
+# O perfil_gosto está em português (tags do GPT), mas as candidatas chegam
+# só com as tags_api do ARTIC (inglês). A ponte é a tabela traducoes_obras,
+# que guarda as duas de cada obra já traduzida: cada tag do ARTIC recebe a
+# afinidade média (pelo perfil) das obras traduzidas que a tinham. O vetor
+# final tem as tags do perfil e as do ARTIC; cada candidata é uma linha
+# esparsa com as suas tags, e o score de todas sai de uma operação
+# vetorizada (np.bincount). Só as melhores seguem para o GPT.
+
+import os
+
+import numpy as np
+
+from main import PerfilGosto, TraducaoObra, normalizar_tags
+
+# Quantas candidatas seguem para o traduzir_e_taguear
+RANKER_TOP_N = int(os.getenv("RANKER_TOP_N", "20"))
+
+
+def _pesos_do_perfil(db) -> dict[str, float]:
+    """{tag em português: score}, normalizado pelo maior (a escala acumulada cresce com o tempo)."""
+    linhas = db.query(PerfilGosto.tag, PerfilGosto.score_acumulado).all()
+    maior = max((score or 0.0 for _, score in linhas), default=0.0)
+    if maior <= 0:
+        return {}
+    return {tag: (score or 0.0) / maior for tag, score in linhas if score}
+
+
+def _pesos_do_artic(db, perfil: dict[str, float]) -> dict[str, float]:
+    """
+    {tag do ARTIC: afinidade}, onde a afinidade de uma obra traduzida é a
+    média dos pesos do perfil nas suas tags em português, e a de uma tag do
+    ARTIC é a média das obras que a tinham.
+    """
+    afinidades, linhas, colunas = [], [], []
+    vocabulario: dict[str, int] = {}
+    consulta = db.query(TraducaoObra.tags, TraducaoObra.tags_api).filter(
+        TraducaoObra.tags_api.isnot(None), TraducaoObra.tags_api != ""
+    )
+    for tags, tags_api in consulta:
+        tags_pt = normalizar_tags(tags)
+        if not tags_pt:
+            continue
+        linha = len(afinidades)
+        afinidades.append(sum(perfil.get(tag, 0.0) for tag in tags_pt) / len(tags_pt))
+        for tag in normalizar_tags(tags_api):
+            linhas.append(linha)
+            colunas.append(vocabulario.setdefault(tag, len(vocabulario)))
+
+    if not colunas:
+        return {}
+    colunas = np.asarray(colunas, dtype=np.intp)
+    pesos = np.asarray(afinidades, dtype=np.float64)[np.asarray(linhas, dtype=np.intp)]
+    medias = np.bincount(colunas, weights=pesos) / np.bincount(colunas)
+    return {tag: float(medias[coluna]) for tag, coluna in vocabulario.items() if medias[coluna] > 0}
+
+
+def vetor_perfil(db) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Vocabulário (tag → coluna) e vetor denso de pesos em [0, 1]: as tags do
+    perfil e as do ARTIC ligadas a elas pelas traduções guardadas.
+    """
+    perfil = _pesos_do_perfil(db)
+    pesos = dict(perfil)
+    if perfil:
+        for tag, peso in _pesos_do_artic(db, perfil).items():
+            pesos[tag] = max(peso, pesos.get(tag, 0.0))
+    vocabulario = {tag: coluna for coluna, tag in enumerate(pesos)}
+    return vocabulario, np.array(list(pesos.values()), dtype=np.float64)
+
+
+def tags_da_candidata(obra: dict, tags_pt: str = "") -> list[str]:
+    """Tags normalizadas da candidata: as do ARTIC e as em português, se houver."""
+    return normalizar_tags(", ".join(obra.get("tags_api") or []) + ", " + (tags_pt or ""))
+
+
+def pontuar(tags_por_obra: list[list[str]], vocabulario: dict[str, int], pesos: np.ndarray) -> np.ndarray:
+    """
+    Score de cada obra = soma dos pesos das suas tags que estão no perfil,
+    dividida por √(nº de tags) para não favorecer quem só tem muitas tags.
+    """
+    linhas, colunas = [], []
+    for linha, tags in enumerate(tags_por_obra):
+        for tag in tags:
+            coluna = vocabulario.get(tag)
+            if coluna is not None:
+                linhas.append(linha)
+                colunas.append(coluna)
+
+    quantidade = len(tags_por_obra)
+    if not linhas:
+        return np.zeros(quantidade)
+    linhas = np.asarray(linhas, dtype=np.intp)
+    brutos = np.bincount(linhas, weights=pesos[np.asarray(colunas, dtype=np.intp)], minlength=quantidade)
+    total_tags = np.array([max(len(tags), 1) for tags in tags_por_obra], dtype=np.float64)
+    return brutos / np.sqrt(total_tags)
+
+
+def ranquear(obras: list[dict], db, tags_pt: dict = None, top_n: int = RANKER_TOP_N) -> list[dict]:
+    """
+    As `top_n` candidatas mais alinhadas ao perfil, da melhor para a pior.
+    Empates mantêm a ordem da busca. Se nenhuma candidata tem afinidade
+    (perfil vazio ou sem ponte para as tags do ARTIC), devolve todas.
+    `tags_pt`: {artic_id: 'tags, em, português'} das obras já traduzidas.
+    """
+    vocabulario, pesos = vetor_perfil(db)
+    if not vocabulario:
+        print(f"📊 Ranking: perfil vazio, as {len(obras)} candidatas seguem sem corte")
+        return obras
+
+    tags_pt = tags_pt or {}
+    tags_por_obra = [tags_da_candidata(obra, tags_pt.get(obra.get("artic_id"), "")) for obra in obras]
+    scores = pontuar(tags_por_obra, vocabulario, pesos)
+    com_afinidade = int(np.count_nonzero(scores))
+    if not com_afinidade:
+        # Nada a comparar (ex.: ainda não há traduções ligando as tags): cortar seria sorteio
+        print(f"📊 Ranking: nenhuma candidata com afinidade, as {len(obras)} seguem sem corte")
+        return obras
+
+    top_n = min(top_n, len(obras))
+    ordem = np.argsort(-scores, kind="stable")[:top_n]
+    print(
+        f"📊 Ranking pelo perfil ({len(vocabulario)} tags): {len(obras)} → {top_n} candidatas, "
+        f"{com_afinidade} com afinidade"
+    )
+    return [obras[i] for i in ordem]
@@ -0,0 +1,29 @@
+# reconstruir_perfil.py — Refaz o perfil de gosto do zero
+# Apaga o perfil_gosto e reaplica todo o histórico de eventos de like,
+# em lotes (memória limitada mesmo com históricos grandes).
+#
+# Uso: python reconstruir_perfil.py [--lote 1000]
+
+import argparse
+import time
+
+from main import SessionLocal, reconstruir_perfil, LOTE_EVENTOS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstrói o perfil de gosto")
+    parser.add_argument("--lote", type=int, default=LOTE_EVENTOS)
+    args = parser.parse_args()
+
+    print("🔁 Reconstruindo perfil de gosto a partir dos eventos...")
+    inicio = time.perf_counter()
+    db = SessionLocal()
+    try:
+        aplicados = reconstruir_perfil(db, args.lote)
+    finally:
+        db.close()
+    print(f"✅ {aplicados} eventos aplicados em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# test_curador.py — Cache de traduções e ranking das candidatas
+# Roda sem OpenAI nem ARTIC: o GPT é um dublê que traduz o que recebe.
+#   python -m unittest test_curador
+
+import json
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import apoio_testes  # antes do curador: banco e cache de imagens temporários
+import curador
+from main import PerfilGosto, SessionLocal, TraducaoObra
+
+apoio_testes.reservar()
+
+
+def tearDownModule():
+    apoio_testes.liberar()
+
+
+def _obra(artic_id: int) -> dict:
+    return {
+        "artic_id": artic_id,
+        "titulo_original": f"Untitled {artic_id}",
+        "artista": f"Artist {artic_id}",
+        "ano": 2001,
+        "departamento": "Contemporary Art",
+        "image_id": f"img-{artic_id}",
+        "tags_api": ["Painting", "Abstract"],
+    }
+
+
+class GPTFalso:
+    """Traduz todas as obras novas do prompt e escolhe sempre o índice 0."""
+
+    def __init__(self):
+        self.novas_recebidas = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **opcoes):
+        prompt = messages[-1]["content"]
+        novas = json.loads(prompt.split("Obras novas: ", 1)[1])
+        self.novas_recebidas.append([o["titulo"] for o in novas])
+        resposta = {
+            "traducoes": [
+                {"index": o["index"], "titulo": f"Sem Título {o['titulo'][9:]}",
+                 "artista": o["artista"], "tags": "pintura, abstrato"}
+                for o in novas
+            ],
+            "selecionadas": [0],
+        }
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(resposta)))])
+
+
+class TestCacheDeTraducoes(unittest.TestCase):
+    def test_obras_nao_escolhidas_nao_sao_traduzidas_de_novo(self):
+        gpt = GPTFalso()
+        with mock.patch.object(curador, "client", gpt):
+            # 1ª noite: 4 candidatas, o GPT escolhe só a primeira
+            escolhidas = curador.traduzir_e_taguear([_obra(i) for i in (1, 2, 3, 4)])
+            self.assertEqual([o["titulo"] for o in escolhidas], ["Sem Título 1"])
+
+            # 2ª noite: a obra 1 já passou no feed; 2 e 3 voltam na busca
+            escolhidas = curador.traduzir_e_taguear([_obra(i) for i in (2, 3, 5)])
+
+        self.assertEqual(gpt.novas_recebidas[0], ["Untitled 1", "Untitled 2", "Untitled 3", "Untitled 4"])
+        self.assertEqual(gpt.novas_recebidas[1], ["Untitled 5"])
+        # A escolhida da 2ª noite (índice 0 = obra 2) vem do banco, sem nova tradução
+        self.assertEqual(escolhidas, [{"index": 0, "titulo": "Sem Título 2", "artista": "Artist 2",
+                                       "tags": "pintura, abstrato"}])
+        self.assertEqual(set(curador.traducoes_conhecidas([1, 2, 3, 4, 5])), {1, 2, 3, 4, 5})
+
+
+class TestRanking(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.db.query(PerfilGosto).delete()
+        self.db.query(TraducaoObra).delete()
+        self.db.add_all([
+            PerfilGosto(tag="colagem", peso=3, score_acumulado=3.0),
+            PerfilGosto(tag="abstrato", peso=1, score_acumulado=1.0),
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def _candidatas(self):
+        candidatas = [_obra(i) for i in range(10, 14)]
+        candidatas[2]["tags_api"] = ["Collage", "Mixed Media"]
+        candidatas[3]["tags_api"] = ["Photography"]
+        return candidatas
+
+    def test_sem_ponte_entre_as_tags_nao_corta(self):
+        candidatas = self._candidatas()
+        self.assertEqual(curador.ranquear_candidatas(self.db, candidatas), candidatas)
+
+    def test_tags_do_artic_pontuam_pelas_traducoes_guardadas(self):
+        self.db.add_all([
+            TraducaoObra(artic_id=900, titulo="a", artista="a", tags="colagem, papel", tags_api="Collage"),
+            TraducaoObra(artic_id=901, titulo="b", artista="b", tags="fotografia", tags_api="Photography"),
+        ])
+        self.db.commit()
+        ranqueadas = curador.ranquear(self._candidatas(), self.db, top_n=2)
+        # Só a 12 ("Collage" ↔ colagem) tem afinidade; a vaga restante segue a ordem da busca
+        self.assertEqual([o["artic_id"] for o in ranqueadas], [12, 10])
+
+
+if __name__ == "__main__":
+    unittest.main()
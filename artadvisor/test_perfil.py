@@ -0,0 +1,140 @@
+# test_perfil.py — Perfil de gosto materializado a partir dos eventos de like
+# Cobre o unlike (no mesmo lote e em lotes diferentes), o compare-and-set do
+# cursor, a reconstrução completa e a troca de época do fator de gosto.
+#   python -m unittest test_perfil
+
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import apoio_testes  # antes do main: banco e cache de imagens temporários
+import main
+from main import EstadoMaterializacao, EventoLike, Obra, PerfilGosto, SessionLocal, VISAO_PERFIL
+
+apoio_testes.reservar()
+
+
+def tearDownModule():
+    apoio_testes.liberar()
+
+
+class TestPerfil(unittest.TestCase):
+    def setUp(self):
+        self.db = SessionLocal()
+        self.db.query(EventoLike).delete()
+        self.db.query(PerfilGosto).delete()
+        self.db.execute(main.obra_tag.delete())
+        self.db.query(Obra).delete()
+        self.db.query(EstadoMaterializacao).filter(
+            EstadoMaterializacao.nome == VISAO_PERFIL
+        ).update({"ultimo_evento": 0, "epoca_gosto": None})
+        self.db.commit()
+        main._epoca_gosto = main._EPOCA_GOSTO
+        self.inicio = datetime.utcnow() - timedelta(hours=1)
+        self.obras = {}
+
+    def tearDown(self):
+        self.db.close()
+
+    def _obra(self, tags: str) -> int:
+        obra = Obra(titulo=tags, imagem_url=f"img-{tags}", tags_extraidas=tags, data_exibicao=date.today())
+        self.db.add(obra)
+        self.db.flush()
+        main.vincular_tags(self.db, obra, tags)
+        self.db.commit()
+        return obra.id
+
+    def _evento(self, obra_id: int, curtiu: bool, minutos: int = 0):
+        self.db.add(EventoLike(obra_id=obra_id, curtiu=curtiu,
+                               criado_em=self.inicio + timedelta(minutes=minutos)))
+        self.db.commit()
+
+    def _perfil(self) -> dict:
+        self.db.expire_all()
+        return {p.tag: (p.peso, main.decair(p.score_acumulado)) for p in self.db.query(PerfilGosto)}
+
+    def test_unlike_no_mesmo_lote_desfaz_o_like(self):
+        a, b = self._obra("colagem, papel"), self._obra("colagem")
+        self._evento(a, True, 0)
+        self._evento(b, True, 1)
+        self._evento(a, False, 2)
+        self.assertEqual(main.materializar_perfil(self.db), 3)
+        perfil = self._perfil()
+        self.assertEqual(set(perfil), {"colagem"})
+        self.assertEqual(perfil["colagem"][0], 1)
+        self.assertAlmostEqual(perfil["colagem"][1], main.decair(main.fator_gosto(self.inicio + timedelta(minutes=1))))
+
+    def test_unlike_em_outro_lote_desfaz_o_like_certo(self):
+        a = self._obra("colagem, papel")
+        self._evento(a, True, 0)
+        self._evento(a, False, 1)
+        self._evento(a, True, 2)  # o unlike seguinte desfaz este, não o primeiro
+        self.assertEqual(main.materializar_perfil(self.db, tamanho_lote=3), 3)
+        self._evento(a, False, 3)
+        self.assertEqual(main.materializar_perfil(self.db, tamanho_lote=1), 1)
+        self.assertEqual(self._perfil(), {})
+
+    def test_lote_ja_aplicado_por_outro_processo_nao_conta_duas_vezes(self):
+        a = self._obra("colagem")
+        self._evento(a, True, 0)
+        original = main._aplicar_lote
+
+        def concorrente(db, eventos):
+            # Outro processo aplica o mesmo lote e avança o cursor primeiro
+            outra = SessionLocal()
+            original(outra, eventos)
+            outra.query(EstadoMaterializacao).filter(
+                EstadoMaterializacao.nome == VISAO_PERFIL
+            ).update({"ultimo_evento": eventos[-1].id})
+            outra.commit()
+            outra.close()
+            original(db, eventos)
+
+        with mock.patch.object(main, "_aplicar_lote", concorrente):
+            self.assertEqual(main.materializar_perfil(self.db), 0)
+        self.assertEqual(self._perfil()["colagem"][0], 1)
+        self.assertEqual(main.materializar_perfil(self.db), 0)
+
+    def test_reconstruir_refaz_o_mesmo_perfil(self):
+        a, b = self._obra("colagem, papel"), self._obra("papel, tinta")
+        for minutos, (obra, curtiu) in enumerate([(a, True), (b, True), (a, False), (a, True), (b, False)]):
+            self._evento(obra, curtiu, minutos)
+        main.materializar_perfil(self.db, tamanho_lote=2)
+        esperado = self._perfil()
+
+        self.db.query(PerfilGosto).update({"peso": 99, "score_acumulado": 0.0})
+        self.db.commit()
+        self.assertEqual(main.reconstruir_perfil(self.db, tamanho_lote=2), 5)
+        perfil = self._perfil()
+        self.assertEqual(set(perfil), set(esperado))
+        for tag, (peso, score) in esperado.items():
+            self.assertEqual(perfil[tag][0], peso)
+            self.assertAlmostEqual(perfil[tag][1], score)
+
+    def test_troca_de_epoca_preserva_o_score_decaido(self):
+        a = self._obra("colagem")
+        self._evento(a, True, 0)
+        main.materializar_perfil(self.db)
+        antes = self._perfil()["colagem"]
+
+        limite = main._expoente_gosto(datetime.utcnow()) / 2
+        with mock.patch.object(main, "GOSTO_EXPOENTE_MAX", limite):
+            # Época velha (outro processo já trocou): o compare-and-set recusa
+            self.assertFalse(main._rebasear_epoca(self.db, datetime(2000, 1, 1)))
+            self.assertTrue(main._rebasear_epoca(self.db, None))
+            self.assertFalse(main._rebasear_epoca(self.db, self.db.get(EstadoMaterializacao, VISAO_PERFIL).epoca_gosto))
+
+        depois = self._perfil()["colagem"]
+        self.assertEqual(depois[0], antes[0])
+        self.assertAlmostEqual(depois[1], antes[1], places=6)
+        self.db.expire_all()
+        self.assertLess(self.db.query(PerfilGosto).one().score_acumulado, 2.0)
+
+        # Likes depois da troca entram na escala nova
+        self._evento(a, False, 61)
+        main.materializar_perfil(self.db)
+        self.assertEqual(self._perfil(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()